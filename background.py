@@ -0,0 +1,155 @@
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from backtester import Backtester
+from indicator_cache import fingerprint
+from sweep import OHLC_COLUMNS, STRATEGIES, SharedArray, attach, parameter_grid, _bar_times, _run_one, _set_local, _worker
+
+
+def _backtest(df, initial_capital, skid, risk_manager, position_sizer):
+    """
+    Run one fast-engine backtest in a worker. Returns (results, trades).
+    """
+    bt = Backtester(df, initial_capital=initial_capital, skid=skid, risk_manager=risk_manager,
+                    position_sizer=position_sizer, engine="fast")
+    return bt.run_backtest(), bt.trades
+
+
+def _sweep_chunk(prices, times, dataset, initial_capital, combos):
+    """
+    Run a chunk of sweep parameter sets in a worker. The worker keeps its
+    indicator cache for as long as it is sent the same dataset.
+    """
+    if _worker.get('dataset') != (dataset, initial_capital):
+        _set_local(prices, initial_capital, times=times)
+        _worker['dataset'] = (dataset, initial_capital)
+    return [_run_one(params) for params in combos]
+
+
+def _shared_sweep_chunk(spec, time_spec, dataset, initial_capital, combos):
+    """
+    _sweep_chunk() on a dataset published as SharedArray blocks: the worker
+    attaches by spec when it gets its first chunk of the dataset, so only
+    the specs and parameter sets are pickled per task.
+    """
+    if _worker.get('dataset') != (dataset, initial_capital):
+        shm, prices = attach(*spec)
+        time_shm, times = attach(*time_spec) if time_spec is not None else (None, None)
+        _set_local(prices, initial_capital, shm=(shm, time_shm), times=times)
+        _worker['dataset'] = (dataset, initial_capital)
+    return [_run_one(params) for params in combos]
+
+
+class SweepJob:
+    """
+    A parameter sweep running as chunks on a BackgroundRunner. Rows are
+    available from results() as soon as their chunk finishes. The shared
+    blocks holding its dataset are released once every chunk has finished
+    or been cancelled.
+    """
+    def __init__(self, futures, sizes, rank_by="sharpe_ratio", ascending=False, shared=()):
+        self.futures = futures
+        self.sizes = sizes
+        self.total = sum(sizes)
+        self.rank_by = rank_by
+        self.ascending = ascending
+        self.shared = [block for block in shared if block is not None]
+        self._pending = len(futures)
+        self._lock = threading.Lock()
+        if not futures:
+            self._release()
+        for future in futures:
+            future.add_done_callback(self._chunk_done)
+
+    def _chunk_done(self, future):
+        with self._lock:
+            self._pending -= 1
+            last = self._pending == 0
+        if last:
+            self._release()
+
+    def _release(self):
+        for block in self.shared:
+            block.close()
+        self.shared = []
+
+    @property
+    def completed(self):
+        """
+        Number of parameter sets finished so far.
+        """
+        return sum(size for future, size in zip(self.futures, self.sizes) if future.done())
+
+    def done(self):
+        return all(future.done() for future in self.futures)
+
+    def errors(self):
+        """
+        Exceptions raised by finished chunks.
+        """
+        return [future.exception() for future in self.futures
+                if future.done() and not future.cancelled() and future.exception() is not None]
+
+    def results(self) -> pd.DataFrame:
+        """
+        Ranked rows of the chunks finished so far.
+        """
+        rows = [row for future in self.futures
+                if future.done() and not future.cancelled() and future.exception() is None
+                for row in future.result()]
+        results = pd.DataFrame(rows)
+        if len(results):
+            results = results.sort_values(self.rank_by, ascending=self.ascending, kind="stable").reset_index(drop=True)
+        return results
+
+    def cancel(self):
+        """
+        Cancel the chunks that have not started yet.
+        """
+        for future in self.futures:
+            future.cancel()
+
+
+class BackgroundRunner:
+    """
+    Process pool that runs backtests and sweeps off the Streamlit script
+    thread, so reruns stay responsive while work is in flight. Workers are
+    spawned rather than forked, as the Streamlit server is multi-threaded.
+    """
+    def __init__(self, max_workers=None):
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.pool = ProcessPoolExecutor(max_workers=self.max_workers, mp_context=multiprocessing.get_context("spawn"))
+
+    def submit_backtest(self, df, initial_capital=100000, skid=1.0, risk_manager=None, position_sizer=None):
+        """
+        Queue one backtest. Returns a Future of (results, trades).
+        """
+        return self.pool.submit(_backtest, df, initial_capital, skid, risk_manager, position_sizer)
+
+    def submit_sweep(self, df, grid, strategy="ema", initial_capital=100000, rank_by="sharpe_ratio",
+                     ascending=False, chunk_size=None) -> SweepJob:
+        """
+        Queue every combination of the grid in chunks and return the SweepJob.
+        """
+        combos = parameter_grid(grid, STRATEGIES[strategy])
+        prices = df[OHLC_COLUMNS].to_numpy(dtype=np.float64)
+        dataset = fingerprint(prices)
+        chunk_size = chunk_size or max(1, len(combos) // (self.max_workers * 4))
+
+        chunks = [combos[i:i + chunk_size] for i in range(0, len(combos), chunk_size)]
+        # Publish the dataset once; tasks carry only its specs and their parameter sets
+        times = _bar_times(df)
+        shared_prices = SharedArray(prices)
+        shared_times = SharedArray(times) if times is not None else None
+        time_spec = shared_times.spec if shared_times is not None else None
+        futures = [self.pool.submit(_shared_sweep_chunk, shared_prices.spec, time_spec, dataset, initial_capital, chunk)
+                   for chunk in chunks]
+        return SweepJob(futures, [len(chunk) for chunk in chunks], rank_by, ascending, (shared_prices, shared_times))
+
+    def shutdown(self):
+        self.pool.shutdown(wait=False, cancel_futures=True)
@@ -1,22 +1,283 @@
+import numpy as np
 import pandas as pd
 from risk_manager import RiskManager
 from position_sizer import PositionSizer
+from profiling import profiled
+
+# Exit reason codes used by the array engine (index into EXIT_REASONS)
+EXIT_NONE = 0
+EXIT_STOP = 1
+EXIT_SIGNAL = 2
+EXIT_REASONS = np.array([None, 'Stop Loss', 'Signal'], dtype=object)
+
+ENGINES = ("loop", "fast")
+
+# One record per trade, written by the array engine while it simulates.
+# exit_index is -1 (and exit fields NaN) for a position still open at the end;
+# stop_price is the stop set at entry, before any trailing.
+TRADE_DTYPE = np.dtype([
+    ('entry_index', np.int64),
+    ('exit_index', np.int64),
+    ('entry_price', np.float64),
+    ('exit_price', np.float64),
+    ('size', np.float64),
+    ('stop_price', np.float64),
+    ('reason', np.int8),
+    ('min_low', np.float64),
+    ('trade_return', np.float64),
+    ('profit', np.float64),
+    ('equity', np.float64),
+])
+
+
+def simulate(open_, high, low, signal, initial_capital, skid, risk_manager: RiskManager, position_sizer: PositionSizer, atr=None):
+    """
+    Run the entry/exit/stop state machine over NumPy arrays.
+
+    Mirrors Backtester's bar loop exactly, but only visits bars with a
+    non-zero signal: flat bars can never change state, so their equity is
+    filled in as slices. atr (per bar, e.g. the Keltner ATR column) feeds
+    ATR stops and volatility sizing. Returns a dict of float64 result
+    buffers, int8 exit reason codes and a TRADE_DTYPE record array under
+    'trades'.
+    """
+    open_ = np.ascontiguousarray(open_, dtype=np.float64)
+    high = np.ascontiguousarray(high, dtype=np.float64)
+    low = np.ascontiguousarray(low, dtype=np.float64)
+    signal = np.ascontiguousarray(signal)
+    n = len(open_)
+
+    # Preallocate result buffers
+    entry_prices = np.full(n, np.nan)
+    exit_prices = np.full(n, np.nan)
+    exit_reasons = np.zeros(n, dtype=np.int8)
+    trade_returns = np.zeros(n)
+    profit_losses = np.zeros(n)
+    position_sizes = np.full(n, np.nan)
+    equity_curve = np.full(n, float(initial_capital))
+
+    # Every trade starts on a buy signal, which bounds the record count
+    trades = np.zeros(np.count_nonzero(signal[:max(n - 1, 0)] == 1), dtype=TRADE_DTYPE)
+    num_trades = 0
+
+    # Track portfolio state
+    equity = initial_capital
+    in_position = False
+    entry_price = None
+    position_size = None
+    stop_price = None
+    trailing = risk_manager.get_stop_loss_type() == 'trailing'
+    filled = 0  # Bars before this index already hold the running equity
+
+    for i in np.flatnonzero(signal[:max(n - 1, 0)]):
+        # Bars without a signal just carry the running equity forward
+        equity_curve[filled:i] = equity
+        filled = i + 1
+        sig = signal[i]
+
+        # Entry Logic: Look for buy signals when flat
+        if not in_position and sig == 1:
+            next_open = open_[i + 1]
+            entry_price = next_open + skid * abs(high[i + 1] - next_open)
+
+            # Sizing reads the equity buffer as the bar loop leaves it: this
+            # row only holds live equity if a signal exit was written here
+            capital = equity_curve[i]
+            stop_price = risk_manager.get_stop_price(entry_price, None if atr is None else atr[i])
+            allocated = position_sizer.calculate(entry_price, capital, stop_price)
+            position_size = allocated / entry_price
+
+            entry_prices[i + 1] = entry_price
+            position_sizes[i + 1] = position_size
+            in_position = True
+
+            trade = trades[num_trades]
+            trade['entry_index'] = i + 1
+            trade['entry_price'] = entry_price
+            trade['size'] = position_size
+            trade['stop_price'] = stop_price
+
+        # Exit Logic: Handle stop losses and exit signals when in position
+        elif in_position and sig == -1:
+            if trailing:
+                stop_price = risk_manager.update_trailing_stop(stop_price, high[i])
+
+            if risk_manager.check_stop(low[i], stop_price):
+                exit_price = stop_price
+                exit_index = i
+                exit_reasons[i] = EXIT_STOP
+            else:
+                next_open = open_[i + 1]
+                exit_price = next_open - skid * abs(next_open - low[i + 1])
+                exit_index = i + 1
+                exit_reasons[i + 1] = EXIT_SIGNAL
+
+            trade_return = (exit_price - entry_price) / entry_price
+            profit = trade_return * position_size * entry_price
+            equity += profit
+
+            exit_prices[exit_index] = exit_price
+            trade_returns[exit_index] = trade_return
+            profit_losses[exit_index] = profit
+            equity_curve[exit_index] = equity
+
+            trade['exit_index'] = exit_index
+            trade['exit_price'] = exit_price
+            trade['reason'] = exit_reasons[exit_index]
+            trade['min_low'] = np.nanmin(low[trade['entry_index']:exit_index + 1])
+            trade['trade_return'] = trade_return
+            trade['profit'] = profit
+            trade['equity'] = equity
+            num_trades += 1
+
+            in_position = False
+            entry_price = None
+            position_size = None
+            stop_price = None
+        else:
+            equity_curve[i] = equity
+
+    # Carry equity through the trailing flat bars and record the final value
+    if n > 0:
+        equity_curve[filled:n - 1] = equity
+        equity_curve[n - 1] = equity
+
+    # Keep a position still open at the end so its entry is not lost
+    if in_position:
+        trade['exit_index'] = -1
+        trade['exit_price'] = np.nan
+        trade['min_low'] = np.nan
+        trade['trade_return'] = np.nan
+        trade['profit'] = np.nan
+        trade['equity'] = np.nan
+        num_trades += 1
+
+    return {
+        'entry_price': entry_prices,
+        'exit_price': exit_prices,
+        'exit_reason': exit_reasons,
+        'trade_return': trade_returns,
+        'profit_loss': profit_losses,
+        'position_size': position_sizes,
+        'equity': equity_curve,
+        'trades': trades[:num_trades],
+    }
+
+
+def result_columns(result, lean=False):
+    """
+    Convert simulate()-style result arrays into Backtester output columns.
+    lean=True types every column: float64 prices and position sizes with
+    NaN, categorical Exit Reason and Trade Direction, always present.
+    """
+    if lean:
+        entered = ~np.isnan(result['entry_price'])
+        return {
+            'Trade Entry Price': result['entry_price'],
+            'Trade Exit Price': result['exit_price'],
+            'Exit Reason': pd.Categorical.from_codes(result['exit_reason'].astype(np.int8) - 1, EXIT_REASONS[1:]),
+            'Trade Return': result['trade_return'],
+            'ProfitLoss': result['profit_loss'],
+            'Equity': result['equity'],
+            'Trade Direction': pd.Categorical.from_codes(np.where(entered, 0, -1).astype(np.int8), ['Buy']),
+            'Position Size': result['position_size'],
+        }
+
+    columns = {
+        'Trade Entry Price': result['entry_price'],
+        'Trade Exit Price': result['exit_price'],
+        'Exit Reason': EXIT_REASONS[result['exit_reason']],
+        'Trade Return': result['trade_return'],
+        'ProfitLoss': result['profit_loss'],
+        'Equity': result['equity'],
+    }
+
+    # The bar loop only creates these columns once a trade is entered
+    entered = ~np.isnan(result['entry_price'])
+    if entered.any():
+        direction = np.full(len(entered), np.nan, dtype=object)
+        direction[entered] = "Buy"
+        columns['Trade Direction'] = direction
+        columns['Position Size'] = result['position_size']
+
+    return columns
+
+
+def backtest_counts(args, result):
+    """
+    Profiler counters for run_backtest: bars simulated and trades entered.
+    """
+    trades = args[0].trades
+    return {
+        "bars": len(result),
+        "trades": len(trades) if trades is not None else int(result['Trade Entry Price'].notna().sum()),
+    }
 
 class Backtester:
     """
     Trading strategy backtester with risk management and position sizing.
+
+    engine="loop" walks the DataFrame bar by bar; engine="fast" runs the same
+    state machine over NumPy arrays and builds the result columns once.
+    df may be None when only run_arrays() is used (e.g. on BarStore views).
+
+    lean=True returns typed result columns (see result_columns) and, with the
+    fast engine, adds them to a shallow copy of df instead of copying it.
     """
-    def __init__(self, df: pd.DataFrame, initial_capital=100000, skid=1.0, risk_manager: RiskManager=None, position_sizer: PositionSizer=None):
-        self.df = df.copy()
+    def __init__(self, df: pd.DataFrame, initial_capital=100000, skid=1.0, risk_manager: RiskManager=None, position_sizer: PositionSizer=None, engine="loop",
+                 lean=False):
+        if engine not in ENGINES:
+            raise ValueError(f"Unknown engine '{engine}', expected one of {ENGINES}")
+        # The bar loop writes into its frame, so it always gets a copy
+        self.df = df.copy() if df is not None and (engine == "loop" or not lean) else df
+        self.lean = lean
         self.initial_capital = initial_capital
         self.skid = skid
         self.risk_manager = risk_manager
         self.position_sizer = position_sizer
+        self.engine = engine
+        self.trades = None
 
+    @profiled("backtest", backtest_counts)
     def run_backtest(self):
         """
         Execute the backtest simulation with entry/exit logic and risk management.
         """
+        if self.engine == "fast":
+            return self._run_fast()
+        return self._run_loop()
+
+    def run_arrays(self, open_, high, low, signal, atr=None):
+        """
+        Run the array engine straight on price/signal arrays without a
+        DataFrame. Returns simulate()'s result buffers.
+        """
+        return simulate(open_, high, low, signal, self.initial_capital, self.skid, self.risk_manager, self.position_sizer, atr)
+
+    def _run_fast(self):
+        """
+        Array-backed backtest producing the same columns as the bar loop.
+        """
+        df = self.df
+        result = simulate(
+            df['Open'].to_numpy(), df['High'].to_numpy(), df['Low'].to_numpy(), df['Signal'].to_numpy(),
+            self.initial_capital, self.skid, self.risk_manager, self.position_sizer,
+            df['ATR'].to_numpy() if 'ATR' in df else None
+        )
+
+        self.trades = result['trades']
+        if self.lean:
+            self.df = df.copy(deep=False)
+            for name, values in result_columns(result, lean=True).items():
+                self.df[name] = values
+        else:
+            self.df = df.assign(**result_columns(result))
+        return self.df
+
+    def _run_loop(self):
+        """
+        Reference bar-by-bar backtest over the DataFrame.
+        """
         df = self.df
         
         # Initialize tracking columns
@@ -48,9 +309,10 @@ class Backtester:
 
                 # Calculate position size and stop loss
                 capital = df.iloc[i]['Equity']
-                allocated = self.position_sizer.calculate(entry_price, capital)
+                atr = df.iloc[i]['ATR'] if 'ATR' in df.columns else None
+                stop_price = self.risk_manager.get_stop_price(entry_price, atr)
+                allocated = self.position_sizer.calculate(entry_price, capital, stop_price)
                 position_size = allocated / entry_price
-                stop_price = self.risk_manager.get_stop_price(entry_price)
 
                 # Record entry details
                 entry_index = i + 1
@@ -121,5 +383,18 @@ class Backtester:
 
         # Ensure final equity is recorded
         df.at[df.index[-1], 'Equity'] = equity
+        if self.lean:
+            df = self._typed(df)
         self.df = df
         return df
+
+    @staticmethod
+    def _typed(df):
+        """
+        Convert the bar loop's object columns to the lean column types.
+        """
+        for name in ('Trade Entry Price', 'Trade Exit Price', 'Position Size'):
+            df[name] = df[name].astype(np.float64) if name in df else np.nan
+        df['Exit Reason'] = pd.Categorical(df['Exit Reason'], categories=EXIT_REASONS[1:])
+        df['Trade Direction'] = pd.Categorical(df['Trade Direction'] if 'Trade Direction' in df else None, categories=['Buy'])
+        return df
@@ -0,0 +1,153 @@
+import json
+import os
+import numpy as np
+import pandas as pd
+from data_loader import TW_OFFSET_NS
+
+FIELDS = ('open', 'high', 'low', 'close', 'volume')
+
+
+class BarView:
+    """
+    Zero-copy view of one symbol's bars: an int64 nanosecond timestamp array
+    plus one contiguous float64 array per OHLCV field, all memory-mapped.
+    """
+    def __init__(self, symbol, time, fields):
+        self.symbol = symbol
+        self.time = time
+        self.open = fields['open']
+        self.high = fields['high']
+        self.low = fields['low']
+        self.close = fields['close']
+        self.volume = fields['volume']
+
+    def __len__(self):
+        return len(self.time)
+
+    @property
+    def index(self) -> pd.DatetimeIndex:
+        """
+        Timestamps as a DatetimeIndex named 'Date' (same as the loaders).
+        """
+        return pd.DatetimeIndex(self.time.view('datetime64[ns]'), name='Date')
+
+    def slice(self, start=None, end=None):
+        """
+        Bars with start <= time <= end, still as views into the same files.
+        """
+        lo = 0 if start is None else np.searchsorted(self.time, _to_ns(start), side='left')
+        hi = len(self.time) if end is None else np.searchsorted(self.time, _to_ns(end), side='right')
+        fields = {field: getattr(self, field)[lo:hi] for field in FIELDS}
+        return BarView(self.symbol, self.time[lo:hi], fields)
+
+    def to_frame(self) -> pd.DataFrame:
+        """
+        Materialize as a DataFrame shaped like DataLoaderTW.get_data().
+        """
+        return pd.DataFrame({
+            'Open': self.open, 'High': self.high, 'Low': self.low,
+            'Close': self.close, 'Volume': self.volume,
+        }, index=self.index)
+
+
+def _to_ns(value):
+    """
+    Convert a date-like value to int64 nanoseconds.
+    """
+    return pd.Timestamp(value).as_unit('ns').value
+
+
+class BarStore:
+    """
+    Memory-mapped bar store: one directory per symbol holding raw
+    fixed-width arrays (time.i8 plus open/high/low/close/volume.f8) and a
+    meta.json with the committed row count. Files only grow by appending.
+    """
+    def __init__(self, root):
+        self.root = root
+
+    def _dir(self, symbol):
+        return os.path.join(self.root, symbol)
+
+    def symbols(self):
+        """
+        List stored symbols.
+        """
+        if not os.path.isdir(self.root):
+            return []
+        return sorted(name for name in os.listdir(self.root)
+                      if os.path.exists(os.path.join(self._dir(name), 'meta.json')))
+
+    def _count(self, symbol):
+        meta_file = os.path.join(self._dir(symbol), 'meta.json')
+        if not os.path.exists(meta_file):
+            return 0
+        with open(meta_file) as f:
+            return json.load(f)['count']
+
+    def import_tradingview(self, symbol, filepath, time_col="time", chunksize=1_000_000, append=False):
+        """
+        Import a TradingView CSV export (epoch-second times, lowercase OHLC).
+        Reads in chunks so memory stays bounded. With append=True only rows
+        newer than the last stored bar are added. Returns rows written.
+        """
+        path = self._dir(symbol)
+        os.makedirs(path, exist_ok=True)
+
+        count = self._count(symbol) if append else 0
+        if not append and os.path.exists(os.path.join(path, 'meta.json')):
+            os.remove(os.path.join(path, 'meta.json'))
+        last_time = None
+        if count:
+            last_time = np.memmap(os.path.join(path, 'time.i8'), dtype=np.int64, mode='r', shape=(count,))[-1]
+
+        files = {name: open(os.path.join(path, f'{name}.{"i8" if name == "time" else "f8"}'), 'r+b' if count else 'wb')
+                 for name in ('time',) + FIELDS}
+        try:
+            # Drop anything past the committed row count (e.g. an interrupted import)
+            for name, f in files.items():
+                f.truncate(count * 8)
+                f.seek(count * 8)
+
+            written = 0
+            for chunk in pd.read_csv(filepath, chunksize=chunksize):
+                chunk.columns = [col.lower() for col in chunk.columns]
+                times = chunk[time_col.lower()].to_numpy(dtype=np.int64) * 10**9 + TW_OFFSET_NS
+                keep = slice(None) if last_time is None else times > last_time
+                times = times[keep]
+                if len(times) == 0:
+                    continue
+                if np.any(np.diff(times) <= 0) or (last_time is not None and times[0] <= last_time):
+                    raise ValueError(f"Bars for {symbol} must be in strictly increasing time order")
+
+                times.tofile(files['time'])
+                for field in FIELDS:
+                    values = chunk[field].to_numpy(dtype=np.float64) if field in chunk else np.full(len(chunk), np.nan)
+                    values[keep].tofile(files[field])
+                last_time = times[-1]
+                written += len(times)
+        finally:
+            for f in files.values():
+                f.close()
+
+        # Commit the new row count only after every field is written
+        with open(os.path.join(path, 'meta.json'), 'w') as f:
+            json.dump({'count': count + written}, f)
+        return written
+
+    def load(self, symbol, start=None, end=None) -> BarView:
+        """
+        Memory-map a symbol's bars, optionally restricted to [start, end].
+        """
+        count = self._count(symbol)
+        if count == 0:
+            raise ValueError(f"No bars stored for {symbol}")
+
+        path = self._dir(symbol)
+        time = np.memmap(os.path.join(path, 'time.i8'), dtype=np.int64, mode='r', shape=(count,))
+        fields = {field: np.memmap(os.path.join(path, f'{field}.f8'), dtype=np.float64, mode='r', shape=(count,))
+                  for field in FIELDS}
+        bars = BarView(symbol, time, fields)
+        if start is None and end is None:
+            return bars
+        return bars.slice(start, end)
@@ -0,0 +1,234 @@
+import numpy as np
+import pandas as pd
+from backtester import EXIT_STOP, EXIT_SIGNAL, result_columns
+from risk_manager import RiskManager
+from position_sizer import PositionSizer
+
+
+def _per_column(values, k, name):
+    """
+    Broadcast a single object or a per-strategy sequence to a list of length k.
+    """
+    if isinstance(values, (list, tuple)):
+        if len(values) != k:
+            raise ValueError(f"Expected {k} {name}, got {len(values)}")
+        return list(values)
+    return [values] * k
+
+
+class BatchBacktester:
+    """
+    Backtests many strategies over the same bars in one pass.
+
+    Takes a (bars x strategies) signal matrix plus one RiskManager /
+    PositionSizer / skid per strategy (or a single one shared by all) and
+    advances every strategy together bar by bar. Each column reproduces
+    Backtester.run_backtest for that strategy exactly. atr, one column or
+    one per strategy, feeds ATR stops and volatility sizing.
+    """
+    def __init__(self, df: pd.DataFrame, signals, initial_capital=100000, skid=1.0, risk_managers=None, position_sizers=None, atr=None):
+        self.df = df
+        if isinstance(signals, pd.DataFrame):
+            self.columns = list(signals.columns)
+            signals = signals.to_numpy()
+        else:
+            signals = np.asarray(signals)
+            if signals.ndim == 1:
+                signals = signals[:, None]
+            self.columns = list(range(signals.shape[1]))
+
+        if signals.shape[0] != len(df):
+            raise ValueError(f"Signal matrix has {signals.shape[0]} rows, data has {len(df)} bars")
+
+        k = signals.shape[1]
+        self.signals = np.ascontiguousarray(signals)
+        self.initial_capital = initial_capital
+        self.skid = np.broadcast_to(np.asarray(skid, dtype=np.float64), (k,)).copy()
+        self.risk_managers = _per_column(risk_managers or RiskManager(), k, "risk managers")
+        self.position_sizers = _per_column(position_sizers or PositionSizer(), k, "position sizers")
+        if atr is not None:
+            atr = np.asarray(atr, dtype=np.float64)
+            atr = np.broadcast_to(atr[:, None] if atr.ndim == 1 else atr, signals.shape)
+        self.atr = atr
+
+        self.equity = None
+        self.entries = None
+        self.exits = None
+
+    def run_backtest(self):
+        """
+        Run all strategies. Returns the (bars x strategies) equity matrix;
+        per-strategy trades are available from trades() and to_frame().
+        """
+        opens = self.df['Open'].to_numpy(dtype=np.float64)
+        highs = self.df['High'].to_numpy(dtype=np.float64)
+        lows = self.df['Low'].to_numpy(dtype=np.float64)
+        signals = self.signals
+        n, k = signals.shape
+
+        skid = self.skid
+        stop_pct = np.array([rm.stop_loss_pct for rm in self.risk_managers], dtype=np.float64)
+        trailing = np.array([rm.get_stop_loss_type() == 'trailing' for rm in self.risk_managers])
+        position_pct = np.array([ps.position_pct for ps in self.position_sizers], dtype=np.float64)
+        atr_multiplier = np.array([rm.atr_multiplier if rm.get_stop_loss_type() == 'atr' else np.nan for rm in self.risk_managers])
+        initial_risk = np.array([rm.initial_risk or 0.0 for rm in self.risk_managers], dtype=np.float64)
+        risk_equity = np.array([getattr(ps, 'risk_equity', np.nan) for ps in self.position_sizers], dtype=np.float64)
+
+        equity_curve = np.full((n, k), float(self.initial_capital))
+        equity = np.full(k, float(self.initial_capital))
+        in_position = np.zeros(k, dtype=bool)
+        entry_price = np.full(k, np.nan)
+        position_size = np.full(k, np.nan)
+        stop_price = np.full(k, np.nan)
+        entry_row = np.full(k, -1, dtype=np.int64)
+
+        entries = []
+        exits = []
+        filled = 0  # Rows before this index already hold the running equity
+
+        for i in np.flatnonzero((signals[:max(n - 1, 0)] != 0).any(axis=1)):
+            # Rows without any signal just carry every strategy's equity forward
+            equity_curve[filled:i] = equity
+            filled = i + 1
+            sig = signals[i]
+
+            entering = ~in_position & (sig == 1)
+            exiting = in_position & (sig == -1)
+            idle = ~(entering | exiting)
+            equity_curve[i, idle] = equity[idle]
+
+            # Entry Logic: same arithmetic as Backtester / PositionSizer / RiskManager
+            cols = np.flatnonzero(entering)
+            if len(cols):
+                next_open = opens[i + 1]
+                price = next_open + skid[cols] * abs(highs[i + 1] - next_open)
+                capital = equity_curve[i, cols]
+                stop = price * (1 - stop_pct[cols])
+                if self.atr is not None:
+                    atr = self.atr[i, cols]
+                    stop = np.where(~np.isnan(atr_multiplier[cols]) & ~np.isnan(atr), price - atr_multiplier[cols] * atr, stop)
+                stop = np.where(initial_risk[cols] > 0, np.maximum(stop, price * (1 - initial_risk[cols])), stop)
+
+                allocated = capital * position_pct[cols] / price
+                # VolatilityPositionSizer: risk risk_equity of capital down to the stop
+                by_risk = ~np.isnan(risk_equity[cols]) & (price > stop)
+                units = capital * risk_equity[cols] / np.where(by_risk, price - stop, 1.0)
+                allocated = np.where(by_risk, units * price, allocated)
+                size = allocated / price
+
+                entry_price[cols] = price
+                position_size[cols] = size
+                stop_price[cols] = stop
+                entry_row[cols] = i + 1
+                in_position[cols] = True
+                entries.append((cols, np.full(len(cols), i + 1), price, size))
+
+            # Exit Logic: trailing update, stop check, otherwise exit next bar
+            cols = np.flatnonzero(exiting)
+            if len(cols):
+                trail = cols[trailing[cols]]
+                stop_price[trail] = np.maximum(stop_price[trail], highs[i] * (1 - stop_pct[trail]))
+
+                stop_hit = lows[i] <= stop_price[cols]
+                next_open = opens[i + 1]
+                signal_exit = next_open - skid[cols] * abs(next_open - lows[i + 1])
+                exit_price = np.where(stop_hit, stop_price[cols], signal_exit)
+                exit_index = np.where(stop_hit, i, i + 1)
+
+                price = entry_price[cols]
+                trade_return = (exit_price - price) / price
+                profit = trade_return * position_size[cols] * price
+                equity[cols] += profit
+                equity_curve[exit_index, cols] = equity[cols]
+
+                exits.append((
+                    cols, entry_row[cols], exit_index, price, exit_price,
+                    np.where(stop_hit, EXIT_STOP, EXIT_SIGNAL).astype(np.int8),
+                    position_size[cols], trade_return, profit, equity[cols].copy(),
+                ))
+
+                in_position[cols] = False
+                entry_price[cols] = np.nan
+                position_size[cols] = np.nan
+                stop_price[cols] = np.nan
+                entry_row[cols] = -1
+
+        # Carry equity through the trailing rows and record the final values
+        if n > 0:
+            equity_curve[filled:n - 1] = equity
+            equity_curve[n - 1] = equity
+
+        # Keep positions still open at the end (exit_index -1), as Backtester.trades does
+        cols = np.flatnonzero(in_position)
+        if len(cols):
+            missing = np.full(len(cols), np.nan)
+            exits.append((
+                cols, entry_row[cols], np.full(len(cols), -1), entry_price[cols], missing,
+                np.zeros(len(cols), dtype=np.int8), position_size[cols], missing, missing, missing,
+            ))
+
+        self.equity = equity_curve
+        self.entries = self._stack(entries, [
+            ('strategy', np.int64), ('entry_index', np.int64), ('entry_price', np.float64), ('size', np.float64),
+        ])
+        self.exits = self._stack(exits, [
+            ('strategy', np.int64), ('entry_index', np.int64), ('exit_index', np.int64),
+            ('entry_price', np.float64), ('exit_price', np.float64), ('reason', np.int8),
+            ('size', np.float64), ('trade_return', np.float64), ('profit', np.float64), ('equity', np.float64),
+        ])
+        return self.equity
+
+    @staticmethod
+    def _stack(chunks, dtype):
+        """
+        Concatenate per-bar event chunks into one record array sorted by strategy.
+        """
+        records = np.zeros(sum(len(chunk[0]) for chunk in chunks), dtype=dtype)
+        for field_no, (field, _) in enumerate(dtype):
+            if len(records):
+                records[field] = np.concatenate([chunk[field_no] for chunk in chunks])
+        return records[np.argsort(records['strategy'], kind='stable')]
+
+    def _column(self, strategy):
+        """
+        Resolve a strategy label to its column number.
+        """
+        return self.columns.index(strategy)
+
+    def trades(self, strategy) -> np.ndarray:
+        """
+        Trades of one strategy as a record array, in exit order; a position
+        still open at the end comes last with exit_index -1.
+        """
+        j = self._column(strategy)
+        return self.exits[self.exits['strategy'] == j]
+
+    def to_frame(self, strategy) -> pd.DataFrame:
+        """
+        Rebuild the DataFrame Backtester.run_backtest returns for one strategy.
+        """
+        j = self._column(strategy)
+        n = len(self.df)
+        entries = self.entries[self.entries['strategy'] == j]
+        exits = self.trades(strategy)
+        exits = exits[exits['exit_index'] >= 0]
+
+        result = {
+            'entry_price': np.full(n, np.nan),
+            'exit_price': np.full(n, np.nan),
+            'exit_reason': np.zeros(n, dtype=np.int8),
+            'trade_return': np.zeros(n),
+            'profit_loss': np.zeros(n),
+            'position_size': np.full(n, np.nan),
+            'equity': self.equity[:, j],
+        }
+        result['entry_price'][entries['entry_index']] = entries['entry_price']
+        result['position_size'][entries['entry_index']] = entries['size']
+        result['exit_price'][exits['exit_index']] = exits['exit_price']
+        result['exit_reason'][exits['exit_index']] = exits['reason']
+        result['trade_return'][exits['exit_index']] = exits['trade_return']
+        result['profit_loss'][exits['exit_index']] = exits['profit']
+
+        df = self.df.copy()
+        df['Signal'] = self.signals[:, j]
+        return df.assign(**result_columns(result))
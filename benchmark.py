@@ -0,0 +1,204 @@
+"""
+Benchmark harness for the load -> indicators -> backtest -> stats pipeline.
+
+Times each stage on the bundled TradingView CSV and on synthetic OHLC series
+(10k / 100k / 1M bars by default) and reports wall time, peak memory and
+bars/second per stage. Results are written to a JSON file so runs can be
+compared over time:
+
+    python benchmark.py --output bench/run.json
+    python benchmark.py --sizes 10000 --compare bench/run.json
+"""
+import argparse
+import gc
+import json
+import os
+import platform
+import subprocess
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+from backtester import Backtester
+from data_loader import DataLoaderTW
+from indicators import IndicatorCalculator
+from position_sizer import PositionSizer
+from risk_manager import RiskManager
+from stats import PerformanceStats
+from trade_log import TradeLog
+
+BUNDLED_CSV = os.path.join(os.path.dirname(os.path.abspath(__file__)), "tradingview_CMC_EURUSD.csv")
+DEFAULT_SIZES = (10_000, 100_000, 1_000_000)
+
+
+def write_synthetic_csv(path, bars, seed=42, start=1_200_000_000, step=3600):
+    """
+    Write a TradingView-format CSV holding a random-walk hourly EURUSD-like series.
+    """
+    rng = np.random.default_rng(seed)
+    close = 1.2 * np.exp(np.cumsum(rng.normal(0, 0.001, bars)))
+    open_ = np.concatenate([[1.2], close[:-1]])
+    spread = np.abs(rng.normal(0, 0.0008, (2, bars)))
+    pd.DataFrame({
+        "time": start + step * np.arange(bars, dtype=np.int64),
+        "open": open_,
+        "high": np.maximum(open_, close) + spread[0],
+        "low": np.minimum(open_, close) - spread[1],
+        "close": close,
+        "Volume": np.nan,
+    }).to_csv(path, index=False)
+
+
+def _measure(fn, repeat, trace_memory):
+    """
+    Best-of-`repeat` wall time, plus peak traced memory from one extra run.
+    """
+    best = float("inf")
+    result = None
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+
+    peak = None
+    if trace_memory:
+        gc.collect()
+        tracemalloc.start()
+        fn()
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return result, best, peak
+
+
+def run_pipeline(name, csv_path, repeat=3, trace_memory=True, loop_max_bars=10_000, lean=False):
+    """
+    Benchmark every pipeline stage on one CSV file, plus the whole
+    load -> stats run. ohlc_ratio is peak memory over the raw float64 OHLC size.
+    lean=True runs the stages in their lean (typed, copy-free) mode.
+    """
+    rows = []
+
+    def record(stage, fn, bars=None):
+        result, seconds, peak = _measure(fn, repeat, trace_memory)
+        if bars is None:
+            bars = len(result)
+        rows.append({
+            "dataset": name,
+            "stage": stage,
+            "bars": bars,
+            "seconds": seconds,
+            "peak_mb": None if peak is None else peak / 2**20,
+            "bars_per_sec": bars / seconds if seconds > 0 else None,
+        })
+        print(f"{name:>12} {stage:<18} {bars:>9} bars {seconds * 1000:>10.2f} ms", flush=True)
+        return result
+
+    raw = record("load", lambda: DataLoaderTW(csv_path).get_data())
+    bars = len(raw)
+
+    indicator = IndicatorCalculator(short_period=9, long_period=21, lean=lean)
+    df = record("indicators", lambda: indicator.apply_ema_crossover(raw), bars)
+
+    def make_backtester(engine, df=df):
+        return Backtester(df, initial_capital=100000, skid=1.0,
+                          risk_manager=RiskManager(stop_loss_pct=0.01, stop_loss_type="trailing"),
+                          position_sizer=PositionSizer(position_pct=0.01), engine=engine, lean=lean)
+
+    def fast_backtest():
+        bt = make_backtester("fast")
+        return bt.run_backtest(), bt.trades
+
+    results, trades = record("backtest", fast_backtest, bars)
+    record("trade_log", lambda: TradeLog(results, 100000, 0.01, trades=trades, lean=lean).generate(), bars)
+    record("stats", lambda: PerformanceStats(results, trades=trades).compute(), bars)
+
+    def full_run():
+        bt = make_backtester("fast", indicator.apply_ema_crossover(DataLoaderTW(csv_path).get_data()))
+        results = bt.run_backtest()
+        TradeLog(results, 100000, 0.01, trades=bt.trades, lean=lean).generate()
+        return PerformanceStats(results, trades=bt.trades).compute()
+
+    record("pipeline", full_run, bars)
+
+    # Reference paths are quadratic / per-bar Python; only time them on small data
+    if bars <= loop_max_bars:
+        record("backtest_loop", lambda: make_backtester("loop").run_backtest(), bars)
+        record("trade_log_scan", lambda: TradeLog(results, 100000, 0.01).generate(), bars)
+        record("stats_scan", lambda: PerformanceStats(results).compute(), bars)
+
+    ohlc_bytes = bars * 4 * 8
+    for row in rows:
+        row["ohlc_ratio"] = None if row["peak_mb"] is None else row["peak_mb"] * 2**20 / ohlc_bytes
+    return rows
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def compare(current, baseline_path):
+    """
+    Print per-stage speed ratios against an earlier results file.
+    """
+    with open(baseline_path) as f:
+        baseline = {(r["dataset"], r["stage"]): r for r in json.load(f)["results"]}
+    print(f"\nvs {baseline_path} (ratio > 1 means faster now)")
+    for row in current:
+        old = baseline.get((row["dataset"], row["stage"]))
+        if old and row["seconds"] > 0:
+            print(f"{row['dataset']:>12} {row['stage']:<18} {old['seconds'] / row['seconds']:>8.2f}x")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the backtest pipeline stages.")
+    parser.add_argument("--sizes", type=int, nargs="*", default=list(DEFAULT_SIZES),
+                        help="synthetic series lengths in bars")
+    parser.add_argument("--repeat", type=int, default=3, help="timed runs per stage (best is kept)")
+    parser.add_argument("--no-memory", action="store_true", help="skip the tracemalloc peak-memory run")
+    parser.add_argument("--lean", action="store_true", help="run the stages in lean (typed, copy-free) mode")
+    parser.add_argument("--loop-max-bars", type=int, default=10_000,
+                        help="largest dataset on which the reference loop/scan paths are timed")
+    parser.add_argument("--output", default=None, help="JSON results file (default: benchmarks/<timestamp>.json)")
+    parser.add_argument("--compare", default=None, help="earlier JSON results file to compare against")
+    args = parser.parse_args(argv)
+
+    started = datetime.now(timezone.utc)
+    rows = run_pipeline("bundled", BUNDLED_CSV, args.repeat, not args.no_memory, args.loop_max_bars, args.lean)
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in args.sizes:
+            path = os.path.join(tmp, f"synthetic_{size}.csv")
+            write_synthetic_csv(path, size)
+            rows += run_pipeline(f"synthetic_{size}", path, args.repeat, not args.no_memory, args.loop_max_bars, args.lean)
+
+    report = {
+        "started": started.isoformat(),
+        "git_commit": _git_commit(),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+        "machine": platform.platform(),
+        "lean": args.lean,
+        "results": rows,
+    }
+
+    output = args.output or os.path.join("benchmarks", started.strftime("%Y%m%dT%H%M%SZ") + ".json")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nResults written to {output}")
+
+    if args.compare:
+        compare(rows, args.compare)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,272 @@
+"""
+Headless batch runner: backtest parameter grids from a JSON job file.
+
+    python cli.py jobs.json --output results --workers 8
+
+A job file holds one job or {"jobs": [...]}; each job names its data, its
+strategy ("ema" or "keltner"), a parameter grid and fixed risk settings:
+
+    {
+      "jobs": [{
+        "name": "eurusd-ema",
+        "data": {"source": "tradingview", "path": "tradingview_CMC_EURUSD.csv"},
+        "strategy": "ema",
+        "initial_capital": 100000,
+        "grid": {"short_period": [5, 9, 12], "long_period": [21, 50]},
+        "risk": {"stop_loss_type": "trailing", "stop_loss_pct": 0.25, "skid": 1.0, "position_pct": 0.01}
+      }]
+    }
+
+"data" is {"source": "tradingview", "path": ..., "time_col": "time"} (paths
+relative to the job file) or {"source": "yfinance", "symbol": ..., "start":
+..., "end": ..., "interval": ...}. "risk" values may be scalars or lists.
+
+Every parameter set is a run identified by a hash of its dataset contents,
+strategy, capital and parameters. Finished chunks are appended to the
+output directory as numbered part files (Parquet when pyarrow is installed,
+otherwise CSV), so an interrupted batch resumes by skipping the runs already
+written. Each dataset is copied into shared memory once and attached by
+every worker at start-up, so tasks carry only parameter sets. Streamlit and plotly are never imported; yfinance only for
+yfinance data.
+"""
+import argparse
+import hashlib
+import json
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import numpy as np
+import pandas as pd
+
+from background import _sweep_chunk
+from data_cache import DataCache
+from data_loader import DataLoaderTW, DataLoaderYF
+from indicator_cache import fingerprint
+from sweep import OHLC_COLUMNS, STRATEGIES, SharedArray, attach, parameter_grid, _bar_times
+
+try:
+    import pyarrow  # noqa: F401
+    PART_FORMAT = "parquet"
+except ImportError:
+    PART_FORMAT = "csv"
+
+# Per-process {dataset: (shared blocks, prices, bar times)}, set up once by _init_worker
+_datasets = {}
+
+
+def read_jobs(path) -> list:
+    """
+    Load the job list from a job file, resolving data paths against its directory.
+    """
+    with open(path) as f:
+        spec = json.load(f)
+    jobs = spec["jobs"] if "jobs" in spec else [spec]
+    base = os.path.dirname(os.path.abspath(path))
+
+    for number, job in enumerate(jobs):
+        job.setdefault("name", f"job-{number}")
+        job.setdefault("strategy", "ema")
+        job.setdefault("initial_capital", 100000)
+        if job["strategy"] not in STRATEGIES:
+            raise ValueError(f"{job['name']}: unknown strategy '{job['strategy']}', expected one of {tuple(STRATEGIES)}")
+        data = job.get("data")
+        if not data or data.get("source") not in ("tradingview", "yfinance"):
+            raise ValueError(f"{job['name']}: data.source must be 'tradingview' or 'yfinance'")
+        if data["source"] == "tradingview":
+            data["path"] = os.path.join(base, data["path"])
+    return jobs
+
+
+def load_prices(data: dict) -> tuple:
+    """
+    (bars x 4) float64 OHLC array and int64 bar times (see _bar_times) for
+    a job's data spec.
+    """
+    if data["source"] == "yfinance":
+        loader = DataLoaderYF(data.get("symbol", "EURUSD=X"), data.get("start", "2019-01-01"),
+                              data.get("end", "2024-12-31"), data.get("interval", "1d"), cache=DataCache())
+    else:
+        loader = DataLoaderTW(data["path"], time_col=data.get("time_col", "time"), cache=DataCache())
+    df = loader.get_data()
+    if df.empty:
+        raise ValueError(f"No data loaded for {data}")
+    return df[OHLC_COLUMNS].to_numpy(dtype=np.float64), _bar_times(df)
+
+
+def expand(job: dict) -> list:
+    """
+    Every parameter set of a job: the grid crossed with its risk settings.
+    """
+    grid = dict(job.get("grid", {}))
+    for name, value in job.get("risk", {}).items():
+        grid[name] = value if isinstance(value, list) else [value]
+    return parameter_grid(grid, STRATEGIES[job["strategy"]])
+
+
+def run_id(dataset, strategy, initial_capital, params) -> str:
+    """
+    Stable identifier of one backtest run, used to skip it on resume.
+    """
+    key = json.dumps([dataset, strategy, initial_capital, params], sort_keys=True, default=str)
+    return hashlib.blake2b(key.encode(), digest_size=12).hexdigest()
+
+
+class ResultsStore:
+    """
+    Directory of numbered part files that together form one results table.
+    """
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+
+    def _parts(self):
+        return sorted(name for name in os.listdir(self.path)
+                      if name.startswith("part-") and name.endswith((".parquet", ".csv")))
+
+    def _read(self, name, columns=None):
+        path = os.path.join(self.path, name)
+        if name.endswith(".parquet"):
+            return pd.read_parquet(path, columns=columns)
+        return pd.read_csv(path, usecols=columns)
+
+    def completed(self) -> set:
+        """
+        run_ids already written.
+        """
+        return {run for name in self._parts() for run in self._read(name, ["run_id"])["run_id"]}
+
+    def append(self, rows):
+        """
+        Write rows as the next part file (atomically, so a crash never leaves a partial part).
+        """
+        parts = self._parts()
+        number = int(parts[-1].split("-")[1].split(".")[0]) + 1 if parts else 0
+        name = f"part-{number:06d}.{PART_FORMAT}"
+        tmp = os.path.join(self.path, f".{name}.tmp")
+        frame = pd.DataFrame(rows)
+        if PART_FORMAT == "parquet":
+            frame.to_parquet(tmp, index=False)
+        else:
+            frame.to_csv(tmp, index=False)
+        os.replace(tmp, os.path.join(self.path, name))
+
+    def load(self) -> pd.DataFrame:
+        """
+        Every result written so far as one table.
+        """
+        parts = [self._read(name) for name in self._parts()]
+        return pd.concat(parts, ignore_index=True) if parts else pd.DataFrame()
+
+    def clear(self):
+        for name in self._parts():
+            os.remove(os.path.join(self.path, name))
+
+
+def _init_worker(specs):
+    """
+    Attach to every dataset's shared price and bar time blocks once per
+    worker process.
+    """
+    for dataset, (price_spec, time_spec) in specs.items():
+        price_shm, prices = attach(*price_spec)
+        time_shm, times = attach(*time_spec) if time_spec is not None else (None, None)
+        _datasets[dataset] = ((price_shm, time_shm), prices, times)
+
+
+def _run_chunk(dataset, job, chunk):
+    """
+    Worker task: backtest a chunk of (run_id, params) and tag the result rows.
+    """
+    _, prices, times = _datasets[dataset]
+    rows = _sweep_chunk(prices, times, dataset, job["initial_capital"], [params for _, params in chunk])
+    for (run, _), row in zip(chunk, rows):
+        row.update(run_id=run, job=job["name"], strategy=job["strategy"], dataset=dataset)
+    return rows
+
+
+def run_jobs(jobs, output, workers=None, chunk_size=64, resume=True, log=print) -> ResultsStore:
+    """
+    Run every pending parameter set of the jobs on a process pool, appending
+    each finished chunk to the results store in `output`.
+    """
+    store = ResultsStore(output)
+    if not resume:
+        store.clear()
+    done = store.completed()
+    workers = workers or os.cpu_count() or 1
+
+    total = skipped = finished = 0
+    start = time.perf_counter()
+    # {dataset: (prices block, bar times block)}, one per distinct dataset
+    shared = {}
+    try:
+        queued = []
+        for job in jobs:
+            prices, times = load_prices(job["data"])
+            dataset = fingerprint(prices)
+            if dataset not in shared:
+                shared[dataset] = (SharedArray(prices), SharedArray(times) if times is not None else None)
+            runs = [(run_id(dataset, job["strategy"], job["initial_capital"], params), params) for params in expand(job)]
+            todo = [(run, params) for run, params in runs if run not in done]
+            total += len(runs)
+            skipped += len(runs) - len(todo)
+            log(f"{job['name']}: {len(prices)} bars, {len(runs)} runs, {len(runs) - len(todo)} already done")
+            queued.append((dataset, job, todo))
+
+        specs = {dataset: (prices.spec, times.spec if times is not None else None)
+                 for dataset, (prices, times) in shared.items()}
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(specs,)) as pool:
+            pending = set()
+            for dataset, job, todo in queued:
+                for i in range(0, len(todo), chunk_size):
+                    pending.add(pool.submit(_run_chunk, dataset, job, todo[i:i + chunk_size]))
+                    # Write results as they come in rather than holding them all
+                    while len(pending) >= workers * 2:
+                        finished += _collect(pending, store)
+
+            while pending:
+                finished += _collect(pending, store)
+    finally:
+        for blocks in shared.values():
+            for block in blocks:
+                if block is not None:
+                    block.close()
+
+    log(f"{finished} runs in {time.perf_counter() - start:.1f}s, {skipped} skipped, {total} total")
+    return store
+
+
+def _collect(pending, store) -> int:
+    """
+    Wait for at least one chunk and append the finished ones to the store.
+    """
+    completed, _ = wait(pending, return_when=FIRST_COMPLETED)
+    count = 0
+    for future in completed:
+        pending.discard(future)
+        rows = future.result()
+        store.append(rows)
+        count += len(rows)
+    return count
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run backtest parameter grids from a JSON job file.")
+    parser.add_argument("job_file", help="JSON job file")
+    parser.add_argument("--output", default="results", help="results directory (default: results)")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: CPU count)")
+    parser.add_argument("--chunk-size", type=int, default=64, help="parameter sets per worker task")
+    parser.add_argument("--restart", action="store_true", help="discard existing results instead of resuming")
+    args = parser.parse_args(argv)
+
+    if args.chunk_size < 1:
+        parser.error("--chunk-size must be at least 1")
+    jobs = read_jobs(args.job_file)
+    run_jobs(jobs, args.output, args.workers, args.chunk_size, resume=not args.restart,
+             log=lambda message: print(message, file=sys.stderr))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+import hashlib
+import json
+import os
+import shutil
+import time
+import numpy as np
+import pandas as pd
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "forex-backtest")
+
+
+class DataCache:
+    """
+    On-disk cache of normalized OHLCV frames.
+
+    Each entry is a directory holding one raw .npy file per column plus the
+    datetime index, so a hit is a handful of binary reads instead of a CSV
+    parse or a download. Entries are keyed by source, symbol, interval, date
+    range, non-default price dtype and file mtime/size.
+
+    Invalidation:
+    - a changed source file produces a new key, and older versions of the
+      same dataset are removed when the new one is stored;
+    - load(max_age=...) treats entries older than max_age seconds as missing
+      (used for downloaded data whose latest bars can still change);
+    - invalidate() removes one entry or the whole cache.
+    """
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR):
+        self.cache_dir = cache_dir
+
+    def key(self, source, symbol, interval=None, start=None, end=None, mtime=None, dtype=None) -> str:
+        """
+        Build the cache key for one dataset. Loads of the same data at
+        different dtypes are separate datasets, not versions of one.
+        """
+        parts = {
+            "source": source,
+            "symbol": str(symbol),
+            "interval": interval,
+            "start": None if start is None else str(start),
+            "end": None if end is None else str(end),
+            "mtime": mtime,
+        }
+        if dtype is not None:
+            parts["dtype"] = dtype
+        digest = hashlib.sha1(json.dumps(parts, sort_keys=True).encode()).hexdigest()[:16]
+        return f"{self._family(parts)}-{digest}"
+
+    @staticmethod
+    def _family(parts):
+        """
+        Prefix shared by all versions (mtimes) of the same dataset.
+        """
+        family = json.dumps({k: v for k, v in parts.items() if k != "mtime"}, sort_keys=True)
+        return hashlib.sha1(family.encode()).hexdigest()[:8]
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key)
+
+    def load(self, key, max_age=None):
+        """
+        Return the cached frame for key, or None on a miss or expired entry.
+        """
+        path = self._path(key)
+        meta_file = os.path.join(path, "meta.json")
+        if not os.path.exists(meta_file):
+            return None
+
+        with open(meta_file) as f:
+            meta = json.load(f)
+        if max_age is not None and time.time() - meta["created"] > max_age:
+            self.invalidate(key)
+            return None
+
+        index = pd.DatetimeIndex(np.load(os.path.join(path, "index.npy"), allow_pickle=False), name=meta["index_name"])
+        if meta["tz"]:
+            index = index.tz_localize("UTC").tz_convert(meta["tz"])
+        columns = {
+            col: np.load(os.path.join(path, f"{i}.npy"), allow_pickle=False)
+            for i, col in enumerate(meta["columns"])
+        }
+        return pd.DataFrame(columns, index=index)
+
+    def store(self, key, df: pd.DataFrame):
+        """
+        Write df under key, replacing older versions of the same dataset.
+        """
+        os.makedirs(self.cache_dir, exist_ok=True)
+        tmp = self._path(f".{key}.{os.getpid()}.tmp")
+        shutil.rmtree(tmp, ignore_errors=True)
+        os.makedirs(tmp)
+
+        index = pd.DatetimeIndex(df.index)
+        tz = str(index.tz) if index.tz is not None else None
+        if tz:
+            index = index.tz_convert("UTC").tz_localize(None)
+        np.save(os.path.join(tmp, "index.npy"), index.to_numpy(), allow_pickle=False)
+        for i, col in enumerate(df.columns):
+            np.save(os.path.join(tmp, f"{i}.npy"), df[col].to_numpy(), allow_pickle=False)
+
+        meta = {
+            "columns": [str(col) for col in df.columns],
+            "index_name": df.index.name,
+            "tz": tz,
+            "created": time.time(),
+        }
+        with open(os.path.join(tmp, "meta.json"), "w") as f:
+            json.dump(meta, f)
+
+        # Drop stale versions of this dataset, then publish the new entry
+        family = key.split("-")[0]
+        for name in os.listdir(self.cache_dir):
+            if name.startswith(family + "-") and name != key:
+                shutil.rmtree(self._path(name), ignore_errors=True)
+        shutil.rmtree(self._path(key), ignore_errors=True)
+        os.replace(tmp, self._path(key))
+
+    def invalidate(self, key=None):
+        """
+        Remove one entry, or every entry when key is None.
+        """
+        if key is None:
+            shutil.rmtree(self.cache_dir, ignore_errors=True)
+        else:
+            shutil.rmtree(self._path(key), ignore_errors=True)
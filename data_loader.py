@@ -1,24 +1,47 @@
-import yfinance as yf
+import io
+import os
+import numpy as np
 import pandas as pd
+from data_cache import DataCache
+from profiling import profiled
 
 class DataLoaderYF:
     """
     Yahoo Finance data loader
+
+    Pass a DataCache to keep downloads on disk across runs; entries expire
+    after cache_max_age seconds. `downloader` replaces yf.download (same
+    signature), e.g. with a stub for offline use.
     """
-    def __init__(self, symbol="EURUSD=X", start="2019-01-01", end="2024-12-31", interval="1d"):
+    def __init__(self, symbol="EURUSD=X", start="2019-01-01", end="2024-12-31", interval="1d",
+                 cache: DataCache = None, cache_max_age=24 * 3600, downloader=None):
         self.symbol = symbol
         self.start = start
         self.end = end
         self.interval = interval
+        self.cache = cache
+        self.cache_max_age = cache_max_age
+        if downloader is None:
+            # yfinance is slow to import, so only Yahoo loaders pull it in
+            import yfinance as yf
+            downloader = yf.download
+        self.downloader = downloader
         self.data = None
 
     def _fetch_data(self):
         """
         Fetch and clean data from Yahoo Finance.
         """
+        if self.cache is not None:
+            key = self.cache.key("yfinance", self.symbol, self.interval, self.start, self.end)
+            cached = self.cache.load(key, max_age=self.cache_max_age)
+            if cached is not None:
+                self.data = cached
+                return self.data
+
         try:
             # Download data from Yahoo Finance
-            df = yf.download(self.symbol, start=self.start, end=self.end, interval=self.interval, progress=False)
+            df = self.downloader(self.symbol, start=self.start, end=self.end, interval=self.interval, progress=False)
 
             if df.empty:
                 raise ValueError(f"No data returned for {self.symbol} between {self.start} and {self.end}")
@@ -30,6 +53,9 @@ class DataLoaderYF:
             if isinstance(df.columns, pd.MultiIndex):
                 df.columns = [col[0] for col in df.columns]
 
+            if self.cache is not None:
+                self.cache.store(key, df)
+
             self.data = df
             return self.data
 
@@ -37,6 +63,7 @@ class DataLoaderYF:
             print(f"[DataLoader] Error fetching data: {e}")
             return pd.DataFrame()
 
+    @profiled("load")
     def get_data(self):
         """
         Get data with lazy loading (fetch only if not cached).
@@ -45,47 +72,169 @@ class DataLoaderYF:
             return self._fetch_data()
         return self.data
 
-import pandas as pd
+try:
+    import pyarrow  # noqa: F401
+    CSV_ENGINE = "pyarrow"
+except ImportError:
+    CSV_ENGINE = "c"
+
+# TradingView epoch times are shifted to UTC+7 (Vietnam time)
+TW_OFFSET_NS = 7 * 3600 * 10**9
+
+# TradingView column names -> Yahoo Finance names
+TW_COLUMNS = {
+    'open': 'Open',
+    'high': 'High',
+    'low': 'Low',
+    'close': 'Close',
+    'volume': 'Volume'
+}
 
 class DataLoaderTW:
     """
     TradingView CSV data loader for local files.
+
+    Pass a DataCache to reuse the parsed frame until the file changes.
+
+    Price columns are parsed straight to `dtype` (float64, or float32 to
+    halve memory) and times to int64, with the pyarrow engine when it is
+    installed. chunksize reads the file in chunks of that many rows so
+    parsing memory stays bounded on multi-GB exports. After a load,
+    update() parses only the rows added to the end of the file since.
     """
-    def __init__(self, filepath, time_col="time"):
+    def __init__(self, filepath, time_col="time", cache: DataCache = None, dtype=np.float64, chunksize=None, engine=None):
+        if np.dtype(dtype).kind != 'f':
+            raise ValueError(f"dtype must be a float dtype, got {dtype}")
         self.filepath = filepath
         self.time_col = time_col
+        self.cache = cache
+        self.dtype = np.dtype(dtype)
+        self.chunksize = chunksize
+        # The pyarrow engine cannot read in chunks
+        self.engine = engine or ("c" if chunksize else CSV_ENGINE)
         self.data = None
+        self._columns = None
+        self._offset = 0
 
-    def _load_csv(self):
+    def _cache_key(self):
         """
-        Load and process CSV data from TradingView export.
+        Cache key tied to the file's path, price dtype, modification time and size.
         """
-        df = pd.read_csv(self.filepath)
+        stat = os.stat(self.filepath)
+        dtype = None if self.dtype == np.float64 else self.dtype.str
+        return self.cache.key("tradingview", os.path.abspath(self.filepath), self.time_col,
+                              mtime=[stat.st_mtime_ns, stat.st_size], dtype=dtype)
 
-        # Convert UNIX timestamp to datetime
-        df[self.time_col] = pd.to_datetime(df[self.time_col], unit='s')
+    def _read(self, f, engine, names=None) -> dict:
+        """
+        Parse CSV rows from an open file into one array per column.
+        names is given when reading from the middle of the file (no header).
+        """
+        columns = names or list(pd.read_csv(f, nrows=0).columns)
+        if names is None:
+            f.seek(0)
+        dtypes = {col: np.int64 if col == self.time_col else self.dtype for col in columns}
+        header = {} if names is None else {"header": None, "names": names}
+
+        if self.chunksize:
+            chunks = pd.read_csv(f, dtype=dtypes, engine=engine, chunksize=self.chunksize, **header)
+        else:
+            chunks = [pd.read_csv(f, dtype=dtypes, engine=engine, **header)]
+
+        parts = {col: [] for col in columns}
+        for chunk in chunks:
+            for col in columns:
+                parts[col].append(chunk[col].to_numpy(dtype=dtypes[col]))
+        return {col: np.concatenate(arrays) for col, arrays in parts.items()}
+
+    def _frame(self, arrays: dict) -> pd.DataFrame:
+        """
+        Build the OHLC frame, converting epoch seconds to UTC+7 in one int64 step.
+        """
+        times = arrays[self.time_col] * 10**9 + TW_OFFSET_NS
+        index = pd.DatetimeIndex(times.view('datetime64[ns]'), name='Date')
+        return pd.DataFrame({TW_COLUMNS.get(col, col): values for col, values in arrays.items() if col != self.time_col},
+                            index=index)
 
-        # Add 7 hours to simulate UTC+7 (Vietnam time)
-        df[self.time_col] = df[self.time_col] + pd.Timedelta(hours=7)
+    def _line_end(self, f, size):
+        """
+        Offset just past the file's last newline: where appended rows start.
+        """
+        block = 1 << 16
+        pos = size
+        while pos > 0:
+            start = max(0, pos - block)
+            f.seek(start)
+            found = f.read(pos - start).rfind(b'\n')
+            if found >= 0:
+                return start + found + 1
+            pos = start
+        return 0
 
-        # Standardize column names to match Yahoo Finance format
-        df.rename(columns={
-            'open': 'Open',
-            'high': 'High',
-            'low': 'Low',
-            'close': 'Close',
-            'volume': 'Volume'
-        }, inplace=True)
+    def _load_csv(self):
+        """
+        Load and process CSV data from TradingView export.
+        """
+        cached = None
+        if self.cache is not None:
+            key = self._cache_key()
+            cached = self.cache.load(key)
+
+        with open(self.filepath, 'rb') as f:
+            # Rows appended later start after the last newline (see update())
+            self._offset = self._line_end(f, os.fstat(f.fileno()).st_size)
+            f.seek(0)
+            if cached is not None:
+                self._columns = list(pd.read_csv(f, nrows=0).columns)
+                self.data = cached
+                return self.data
+            arrays = self._read(f, self.engine)
+            self._columns = list(arrays)
+        df = self._frame(arrays)
+
+        if self.cache is not None:
+            self.cache.store(key, df)
 
-        # Set datetime as index
-        df.set_index(self.time_col, inplace=True)
+        self.data = df
+        return self.data
 
-        # df = df[['Open', 'High', 'Low', 'Close', 'Volume']].dropna()
-        df.index.name = 'Date'
+    def update(self):
+        """
+        Append the rows added to the file since the last load and return
+        the whole frame. Parsing starts at the last line seen before and
+        stops at the last newline, so a line still being written is left
+        for the next call; rows at or before the last loaded bar are
+        skipped, and a file that shrank is reloaded in full.
+        """
+        if self.data is None:
+            return self.get_data()
+        if self._offset == 0:
+            # Not even the header line was complete at the last load
+            return self._load_csv()
 
-        self.data = df
+        with open(self.filepath, 'rb') as f:
+            size = os.fstat(f.fileno()).st_size
+            if size < self._offset:
+                return self._load_csv()
+            end = self._line_end(f, size)
+            if end <= self._offset:
+                return self.data
+            f.seek(self._offset)
+            tail = io.BytesIO(f.read(end - self._offset))
+
+        new = self._frame(self._read(tail, "c", names=self._columns))
+        self._offset = end
+        if len(self.data):
+            new = new[new.index > self.data.index[-1]]
+        if len(new):
+            if not new.index.is_monotonic_increasing:
+                raise ValueError(f"Appended rows of {self.filepath} are not in time order")
+            self.data = pd.concat([self.data, new])
+            if self.cache is not None:
+                self.cache.store(self._cache_key(), self.data)
         return self.data
 
+    @profiled("load")
     def get_data(self):
         """
         Get data with lazy loading (load only if not cached).
@@ -0,0 +1,129 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from data_cache import DEFAULT_CACHE_DIR
+
+DEFAULT_INDICATOR_DIR = os.path.join(DEFAULT_CACHE_DIR, "indicators")
+
+
+def fingerprint(*arrays) -> str:
+    """
+    Cheap content hash of one or more price arrays (dtype, shape and bytes).
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    for array in arrays:
+        array = np.ascontiguousarray(array)
+        digest.update(f"{array.dtype.str}{array.shape}".encode())
+        digest.update(memoryview(array).cast("B"))
+    return digest.hexdigest()
+
+
+class IndicatorCache:
+    """
+    Memoizes indicator arrays (EMA series, ATR, signal vectors) by the
+    fingerprint of the input prices plus the indicator name and parameters.
+
+    The in-memory tier is an LRU bounded by max_bytes. With cache_dir set,
+    results are also written there as .npy files, so other processes (sweep
+    workers) and later sessions reuse them. Cached arrays are read-only.
+    Thread-safe, so one instance can be shared across Streamlit sessions.
+    """
+    def __init__(self, max_bytes=256 * 2**20, cache_dir=None):
+        self.max_bytes = max_bytes
+        self.cache_dir = cache_dir
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(name, params, data_fingerprint) -> str:
+        """
+        Cache key for one indicator result.
+        """
+        params = hashlib.sha1(repr(tuple(params)).encode()).hexdigest()[:12]
+        return f"{name}-{params}-{data_fingerprint}"
+
+    def _disk_path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.npy")
+
+    def _remember(self, key, values):
+        """
+        Insert into the memory tier, evicting least recently used entries.
+        """
+        if key in self._entries:
+            self._bytes -= self._entries.pop(key).nbytes
+        self._entries[key] = values
+        self._bytes += values.nbytes
+        while self._bytes > self.max_bytes and len(self._entries) > 1:
+            _, evicted = self._entries.popitem(last=False)
+            self._bytes -= evicted.nbytes
+
+    def get_or_compute(self, name, params, data_fingerprint, compute) -> np.ndarray:
+        """
+        Return the cached array for (name, params, data), calling compute()
+        and caching its result on a miss.
+        """
+        key = self.key(name, params, data_fingerprint)
+        with self._lock:
+            values = self._entries.get(key)
+            if values is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return values
+
+        if self.cache_dir is not None and os.path.exists(self._disk_path(key)):
+            values = np.load(self._disk_path(key), allow_pickle=False)
+            values.flags.writeable = False
+            with self._lock:
+                self.disk_hits += 1
+                self._remember(key, values)
+            return values
+
+        values = np.array(compute())
+        values.flags.writeable = False
+        with self._lock:
+            self.misses += 1
+            self._remember(key, values)
+
+        if self.cache_dir is not None:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            tmp = self._disk_path(f".{key}.{os.getpid()}.{threading.get_ident()}.tmp")
+            with open(tmp, "wb") as f:
+                np.save(f, values, allow_pickle=False)
+            os.replace(tmp, self._disk_path(key))
+        return values
+
+    def stats(self) -> dict:
+        """
+        Hit/miss counters and memory tier size.
+        """
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits + self.disk_hits) / lookups if lookups else 0.0,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+            }
+
+    def clear(self, disk=False):
+        """
+        Empty the memory tier (and the disk tier with disk=True) and reset the counters.
+        """
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+            self.hits = self.disk_hits = self.misses = 0
+        if disk and self.cache_dir is not None and os.path.isdir(self.cache_dir):
+            for name in os.listdir(self.cache_dir):
+                if name.endswith(".npy"):
+                    os.remove(os.path.join(self.cache_dir, name))
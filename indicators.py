@@ -1,52 +1,314 @@
 import pandas as pd
 import numpy as np
+from indicator_cache import IndicatorCache, fingerprint
+from profiling import profiled
+from resample import Resampler
+
+def crossover_signal(ema_short, ema_long, short_period, long_period) -> np.ndarray:
+    """
+    Build the +1/-1/0 crossover signal from two EMA arrays.
+    Buy when the short EMA crosses above the long EMA, sell when it crosses below.
+    NaN comparisons are False, so warm-up bars never signal.
+    """
+    ema_short = np.asarray(ema_short, dtype=np.float64)
+    ema_long = np.asarray(ema_long, dtype=np.float64)
+
+    prev_le = np.zeros(len(ema_short), dtype=bool)
+    prev_ge = np.zeros(len(ema_short), dtype=bool)
+    prev_le[1:] = ema_short[:-1] <= ema_long[:-1]
+    prev_ge[1:] = ema_short[:-1] >= ema_long[:-1]
+
+    buy_signal = (ema_short > ema_long) & prev_le
+    sell_signal = (ema_short < ema_long) & prev_ge
+
+    signal = np.where(buy_signal, 1, np.where(sell_signal, -1, 0)).astype(np.int64)
+
+    # No signals before both EMAs are warmed up
+    signal[:max(short_period, long_period - 1)] = 0
+    return signal
+
+def true_range(high, low, close) -> np.ndarray:
+    """
+    True range: the largest of high - low and the gaps from the previous
+    close to this bar's high and low. The first bar is just high - low.
+    """
+    high = np.asarray(high, dtype=np.float64)
+    low = np.asarray(low, dtype=np.float64)
+    close = np.asarray(close, dtype=np.float64)
+
+    tr = high - low
+    if len(tr) > 1:
+        prev_close = close[:-1]
+        np.fmax(tr[1:], np.abs(high[1:] - prev_close), out=tr[1:])
+        np.fmax(tr[1:], np.abs(low[1:] - prev_close), out=tr[1:])
+    return tr
+
+def trend_filter(signal, trend) -> np.ndarray:
+    """
+    Keep buy signals only where trend is positive; sell signals always pass,
+    so exits are never blocked. NaN trend (warm-up) blocks buys.
+    """
+    signal = np.asarray(signal)
+    return np.where((signal == 1) & ~(np.asarray(trend) > 0), 0, signal).astype(signal.dtype)
+
+def breakout_signal(close, upper, lower) -> np.ndarray:
+    """
+    Build the +1/-1/0 channel breakout signal.
+    Buy when the close crosses above the upper band, sell when it crosses
+    below the lower band. NaN bands compare False, so warm-up bars never signal.
+    """
+    close = np.asarray(close, dtype=np.float64)
+    upper = np.asarray(upper, dtype=np.float64)
+    lower = np.asarray(lower, dtype=np.float64)
+
+    prev_le = np.zeros(len(close), dtype=bool)
+    prev_ge = np.zeros(len(close), dtype=bool)
+    prev_le[1:] = close[:-1] <= upper[:-1]
+    prev_ge[1:] = close[:-1] >= lower[:-1]
+
+    buy_signal = (close > upper) & prev_le
+    sell_signal = (close < lower) & prev_ge
+
+    return np.where(buy_signal, 1, np.where(sell_signal, -1, 0)).astype(np.int64)
+
+class StreamingEMA:
+    """
+    O(1) incremental EMA matching IndicatorCalculator.calculate_ema bar for bar
+    (same update as pandas' adjust=False ewm kernel, same warm-up masking).
+    """
+    def __init__(self, period):
+        self.period = period
+        self.alpha = 1. / (1. + (period - 1) / 2)
+        self.old_wt = 1. - self.alpha
+        self.value = None
+        self.count = 0
+
+    def update(self, price):
+        """
+        Feed one price; returns the EMA, or NaN during the first period-1 bars.
+        """
+        if self.value is None or self.value != self.value:
+            self.value = price
+        elif price == price and self.value != price:
+            self.value = (self.old_wt * self.value + self.alpha * price) / (self.old_wt + self.alpha)
+        self.count += 1
+        return self.value if self.count >= self.period else np.nan
 
 class IndicatorCalculator:
-    def __init__(self, short_period=9, long_period=21):
+    """
+    EMA crossover and Keltner channel indicators. With an IndicatorCache,
+    every EMA, ATR and signal vector is computed once per dataset and
+    parameter set and then served from the cache.
+
+    With lean=True the apply_* methods add their columns to a shallow copy
+    of the input frame instead of a full copy, and Signal is int8.
+    """
+    def __init__(self, short_period=9, long_period=21, kc_period=15, atr_period=14, kc_multiplier=1.0, cache: IndicatorCache = None,
+                 lean=False):
         self.short_period = short_period
         self.long_period = long_period
+        self.kc_period = kc_period
+        self.atr_period = atr_period
+        self.kc_multiplier = kc_multiplier
+        self.cache = cache
+        self.lean = lean
+
+    def _frame(self, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        The frame the apply_* methods add columns to.
+        """
+        return df.copy(deep=not self.lean)
+
+    def _signal_column(self, signal):
+        return signal.astype(np.int8) if self.lean else signal
 
-    def calculate_ema(self, series: pd.Series, period: int) -> pd.Series:
+    def _fingerprint(self, *arrays):
         """
-        Manually calculates the Exponential Moving Average (EMA).
+        Fingerprint of the input arrays, or None when there is no cache.
+        """
+        return fingerprint(*arrays) if self.cache is not None else None
+
+    def _memo(self, name, params, data_fingerprint, compute) -> np.ndarray:
+        """
+        compute() through the cache, or directly when there is none.
+        """
+        if self.cache is None:
+            return compute()
+        return self.cache.get_or_compute(name, params, data_fingerprint, compute)
+
+    def calculate_ema(self, series: pd.Series, period: int, data_fingerprint=None) -> pd.Series:
+        """
+        Calculates the Exponential Moving Average (EMA).
         Uses the recursive formula:
             EMA_t = alpha * price_t + (1 - alpha) * EMA_{t-1}
         Where:
             alpha = 2 / (period + 1)
+        Seeded with the first close, evaluated by pandas' compiled ewm kernel
+        (span=period, adjust=False gives exactly this recursion).
+        With a cache the result is keyed by the closes' fingerprint (pass
+        data_fingerprint to skip rehashing) and the period.
         """
-        ema = np.zeros(len(series))
-        alpha = 2 / (period + 1)
+        if self.cache is not None:
+            close = series.to_numpy(dtype=np.float64)
+            values = self._memo("ema", (period,), data_fingerprint or fingerprint(close),
+                                lambda: self._ema(pd.Series(close), period).to_numpy())
+            return pd.Series(values, index=series.index)
+        return self._ema(series, period)
 
-        ema[0] = series.iloc[0]
-        for i in range(1, len(series)):
-            ema[i] = alpha * series.iloc[i] + (1 - alpha) * ema[i - 1]
-
-        ema_series = pd.Series(ema, index=series.index)
+    @staticmethod
+    def _ema(series: pd.Series, period: int) -> pd.Series:
+        ema_series = series.astype(np.float64).ewm(span=period, adjust=False).mean().rename(None)
         ema_series[:period-1] = None
         return ema_series
 
-    def apply_ema_crossover(self, df: pd.DataFrame) -> pd.DataFrame:
-        df = df.copy()
+    def calculate_ema_batch(self, series: pd.Series, periods) -> pd.DataFrame:
+        """
+        Calculates EMAs for many periods, one column per distinct period.
+        The close array is converted once and each period is computed only once,
+        so a short/long grid shares every EMA it needs.
+        """
+        close = pd.Series(series.to_numpy(dtype=np.float64), index=series.index)
+        close_fingerprint = self._fingerprint(close.to_numpy())
+        emas = {}
+        for period in sorted(set(int(p) for p in periods)):
+            emas[period] = self.calculate_ema(close, period, close_fingerprint)
+        return pd.DataFrame(emas, index=series.index)
 
-        df['EMA_Short'] = self.calculate_ema(df['Close'], self.short_period)
-        df['EMA_Long'] = self.calculate_ema(df['Close'], self.long_period)
+    def crossover_signal_matrix(self, series: pd.Series, pairs) -> pd.DataFrame:
+        """
+        Crossover signals for many (short_period, long_period) pairs at once,
+        one column per pair, for BatchBacktester. Each EMA is computed once.
+        """
+        pairs = [(int(short), int(long)) for short, long in pairs]
+        emas = self.calculate_ema_batch(series, [p for pair in pairs for p in pair])
+        close_fingerprint = self._fingerprint(series.to_numpy(dtype=np.float64))
+        signals = np.empty((len(series), len(pairs)), dtype=np.int64)
+        for j, (short, long) in enumerate(pairs):
+            signals[:, j] = self._memo("crossover", (short, long), close_fingerprint,
+                                       lambda: crossover_signal(emas[short], emas[long], short, long))
+        return pd.DataFrame(signals, index=series.index, columns=pd.MultiIndex.from_tuples(pairs) if pairs else None)
 
-        df['Signal'] = 0
-        idx = df.index[self.short_period:]
+    def _hlc(self, df: pd.DataFrame):
+        """
+        High, low and close as float64 arrays.
+        """
+        return tuple(df[col].to_numpy(dtype=np.float64) for col in ('High', 'Low', 'Close'))
 
-        buy_signal = (
-            (df['EMA_Short'] > df['EMA_Long']) &
-            (df['EMA_Short'].shift(1) <= df['EMA_Long'].shift(1))
-        )
+    def calculate_atr(self, df: pd.DataFrame, period: int, data_fingerprint=None) -> pd.Series:
+        """
+        Calculates Wilder's Average True Range (ATR).
+        Seeded with the mean of the first `period` true ranges, then
+            ATR_t = ATR_{t-1} + (TR_t - ATR_{t-1}) / period
+        evaluated by pandas' ewm kernel (alpha=1/period, adjust=False).
+        """
+        hlc = self._hlc(df)
 
-        sell_signal = (
-            (df['EMA_Short'] < df['EMA_Long']) &
-            (df['EMA_Short'].shift(1) >= df['EMA_Long'].shift(1))
-        )
+        def compute():
+            tr = true_range(*hlc)
+            atr = np.full(len(tr), np.nan)
+            if len(tr) >= period:
+                tr[period - 1] = tr[:period].mean()
+                atr[period - 1:] = pd.Series(tr[period - 1:]).ewm(alpha=1 / period, adjust=False).mean().to_numpy()
+            return atr
 
-        df.loc[idx, 'Signal'] = np.where(buy_signal.loc[idx], 1,
-                                np.where(sell_signal.loc[idx], -1, 0))
+        atr = self._memo("atr", (period,), data_fingerprint or self._fingerprint(*hlc), compute)
+        return pd.Series(atr, index=df.index)
 
-        df.loc[df.index[:self.long_period - 1], 'Signal'] = 0
+    def keltner_signal_matrix(self, df: pd.DataFrame, params) -> pd.DataFrame:
+        """
+        Keltner breakout signals for many (kc_period, atr_period, kc_multiplier)
+        sets at once, one column per set, for BatchBacktester. Each EMA and
+        ATR length is computed once.
+        """
+        params = [(int(kc), int(atr), float(mult)) for kc, atr, mult in params]
+        hlc = self._hlc(df)
+        hlc_fingerprint = self._fingerprint(*hlc)
+        emas = self.calculate_ema_batch(df['Close'], [kc for kc, _, _ in params])
+        atrs = {period: self.calculate_atr(df, period, hlc_fingerprint).to_numpy() for period in sorted({atr for _, atr, _ in params})}
+        close = hlc[2]
+
+        signals = np.empty((len(df), len(params)), dtype=np.int64)
+        for j, (kc, atr, mult) in enumerate(params):
+            middle = emas[kc].to_numpy()
+            signals[:, j] = self._memo("keltner", (kc, atr, mult), hlc_fingerprint,
+                                       lambda: breakout_signal(close, middle + mult * atrs[atr], middle - mult * atrs[atr]))
+        return pd.DataFrame(signals, index=df.index, columns=pd.MultiIndex.from_tuples(params) if params else None)
+
+    def ema_crossover_arrays(self, close) -> dict:
+        """
+        EMA crossover on a plain close array (e.g. a BarStore view), without
+        building a DataFrame. Returns EMA_Short, EMA_Long and Signal arrays.
+        """
+        close = pd.Series(np.asarray(close, dtype=np.float64), copy=False)
+        close_fingerprint = self._fingerprint(close.to_numpy())
+        ema_short = self.calculate_ema(close, self.short_period, close_fingerprint).to_numpy()
+        ema_long = self.calculate_ema(close, self.long_period, close_fingerprint).to_numpy()
+        return {
+            'EMA_Short': ema_short,
+            'EMA_Long': ema_long,
+            'Signal': self._memo("crossover", (self.short_period, self.long_period), close_fingerprint,
+                                 lambda: crossover_signal(ema_short, ema_long, self.short_period, self.long_period)),
+        }
+
+    @profiled("indicators")
+    def apply_ema_crossover(self, df: pd.DataFrame, emas: pd.DataFrame = None) -> pd.DataFrame:
+        """
+        Add EMA_Short, EMA_Long and the crossover Signal column.
+        Pass `emas` from calculate_ema_batch to reuse precomputed EMAs.
+        """
+        df = self._frame(df)
+        close_fingerprint = self._fingerprint(df['Close'].to_numpy(dtype=np.float64))
+
+        if emas is not None:
+            df['EMA_Short'] = emas[self.short_period]
+            df['EMA_Long'] = emas[self.long_period]
+        else:
+            df['EMA_Short'] = self.calculate_ema(df['Close'], self.short_period, close_fingerprint)
+            df['EMA_Long'] = self.calculate_ema(df['Close'], self.long_period, close_fingerprint)
+
+        df['Signal'] = self._signal_column(self._memo(
+            "crossover", (self.short_period, self.long_period), close_fingerprint,
+            lambda: crossover_signal(df['EMA_Short'], df['EMA_Long'], self.short_period, self.long_period)))
+
+        return df
+
+    @profiled("indicators")
+    def apply_keltner_channel(self, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Add the Keltner channel (KC_Middle EMA, KC_Upper / KC_Lower at
+        kc_multiplier x ATR), the ATR column and the breakout Signal column.
+        """
+        df = self._frame(df)
+        hlc_fingerprint = self._fingerprint(*self._hlc(df))
+
+        df['KC_Middle'] = self.calculate_ema(df['Close'], self.kc_period)
+        df['ATR'] = self.calculate_atr(df, self.atr_period, hlc_fingerprint)
+        df['KC_Upper'] = df['KC_Middle'] + self.kc_multiplier * df['ATR']
+        df['KC_Lower'] = df['KC_Middle'] - self.kc_multiplier * df['ATR']
+
+        df['Signal'] = self._signal_column(self._memo(
+            "keltner", (self.kc_period, self.atr_period, float(self.kc_multiplier)), hlc_fingerprint,
+            lambda: breakout_signal(df['Close'], df['KC_Upper'], df['KC_Lower'])))
+
+        return df
+
+    @profiled("indicators")
+    def apply_trend_filter(self, df: pd.DataFrame, rule="1D", period=50, resampler: Resampler = None) -> pd.DataFrame:
+        """
+        Higher-timeframe trend filter on the Signal column. Closes are
+        resampled to `rule` and an EMA of `period` bars taken on them; a
+        base bar is in an uptrend when the last closed higher-timeframe close
+        is above that EMA. Adds Trend_EMA and Trend (+1/-1) and drops buys
+        outside uptrends. Pass one Resampler to reuse its resampled bars.
+        """
+        resampler = resampler or Resampler(df)
+        bars = resampler.resample(rule)
+        close = bars['Close']
+        ema = self.calculate_ema(close, period)
 
+        df = self._frame(df)
+        trend_close = resampler.align(rule, close)
+        df['Trend_EMA'] = resampler.align(rule, ema)
+        df['Trend'] = np.sign(trend_close - df['Trend_EMA'].to_numpy())
+        df['Signal'] = trend_filter(df['Signal'].to_numpy(), df['Trend'].to_numpy())
         return df
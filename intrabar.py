@@ -0,0 +1,180 @@
+import numpy as np
+import pandas as pd
+
+from backtester import Backtester, TRADE_DTYPE, EXIT_STOP, EXIT_SIGNAL, backtest_counts, result_columns
+from risk_manager import RiskManager
+from position_sizer import PositionSizer
+from portfolio import _timestamps
+from profiling import profiled
+
+
+class ChildBars:
+    """
+    Lower-timeframe bars grouped under their parent bars.
+
+    A child belongs to the last parent starting at or before it. start[p] to
+    start[p + 1] is parent p's child slice, so lookups are O(1). Parents with
+    no child bars fall back to their own OHLC as a single child.
+    """
+    def __init__(self, parent: pd.DataFrame, child: pd.DataFrame):
+        parent_time = _timestamps(parent.index)
+        child_time = _timestamps(child.index)
+        n = len(parent_time)
+
+        # The last parent covers one typical bar length
+        span = np.median(np.diff(parent_time)) if n > 1 else np.iinfo(np.int64).max - parent_time[-1]
+        covered = (child_time >= parent_time[0]) & (child_time < parent_time[-1] + span)
+        owner = np.searchsorted(parent_time, child_time[covered], side='right') - 1
+        empty = np.flatnonzero(np.bincount(owner, minlength=n) == 0)
+
+        fields = ('Open', 'High', 'Low')
+        values = [np.concatenate([child[f].to_numpy(dtype=np.float64)[covered], parent[f].to_numpy(dtype=np.float64)[empty]])
+                  for f in fields]
+        owner = np.concatenate([owner, empty])
+        order = np.argsort(owner, kind='stable')
+
+        self.open, self.high, self.low = (v[order] for v in values)
+        self.parent = owner[order]
+        self.start = np.searchsorted(self.parent, np.arange(n + 1))
+
+
+def simulate_intrabar(signal, children: ChildBars, initial_capital, skid, risk_manager: RiskManager, position_sizer: PositionSizer, atr=None):
+    """
+    Run the EMA crossover trades with fills and stops resolved on child bars.
+
+    Orders decided on parent bar i fill at the open of bar i + 1's first
+    child, with skid applied to that child's range. While a position is
+    open the stop is checked on every child bar in time order, trailing on
+    the highs of the children before it, and fills at the stop (or the
+    child's open if it gaps through). Only the children of parent bars with
+    a position open are looked at. atr (per parent bar) feeds ATR stops.
+    Returns simulate()-style buffers; equity is the realized equity and
+    entries are sized on it.
+    """
+    signal = np.asarray(signal)
+    n = len(signal)
+    buys = np.flatnonzero(signal[:max(n - 1, 0)] == 1)
+    sells = np.flatnonzero(signal[:max(n - 1, 0)] == -1)
+    c_open, c_high, c_low, start = children.open, children.high, children.low, children.start
+    trailing = risk_manager.get_stop_loss_type() == 'trailing'
+
+    entry_prices = np.full(n, np.nan)
+    exit_prices = np.full(n, np.nan)
+    exit_reasons = np.zeros(n, dtype=np.int8)
+    trade_returns = np.zeros(n)
+    profit_losses = np.zeros(n)
+    position_sizes = np.full(n, np.nan)
+    trades = np.zeros(len(buys), dtype=TRADE_DTYPE)
+    num_trades = 0
+
+    equity = initial_capital
+    bar = 0  # First parent bar whose buy signal can still be taken
+    while True:
+        b = np.searchsorted(buys, bar)
+        if b == len(buys):
+            break
+        entry_bar = buys[b] + 1
+        first = start[entry_bar]
+        entry_price = c_open[first] + skid * abs(c_high[first] - c_open[first])
+        stop_price = risk_manager.get_stop_price(entry_price, None if atr is None else atr[buys[b]])
+        allocated = position_sizer.calculate(entry_price, equity, stop_price)
+        position_size = allocated / entry_price
+
+        entry_prices[entry_bar] = entry_price
+        position_sizes[entry_bar] = position_size
+        trade = trades[num_trades]
+        trade['entry_index'] = entry_bar
+        trade['entry_price'] = entry_price
+        trade['size'] = position_size
+        trade['stop_price'] = stop_price
+        num_trades += 1
+
+        # The position runs until the first exit signal's next open at the latest
+        s = np.searchsorted(sells, entry_bar)
+        signal_exit = sells[s] + 1 if s < len(sells) else None
+        last = start[signal_exit] if signal_exit is not None else len(c_open)
+
+        lows = c_low[first:last]
+        if trailing:
+            stops = np.empty(len(lows))
+            stops[0] = stop_price
+            # Same move as RiskManager.update_trailing_stop, over every earlier child high
+            np.maximum.accumulate(np.maximum(stop_price, c_high[first:last - 1] * (1 - risk_manager.stop_loss_pct)), out=stops[1:])
+        else:
+            stops = stop_price
+        hits = np.flatnonzero(risk_manager.check_stop(lows, stops))
+
+        if len(hits):
+            child = first + hits[0]
+            stop = stops[hits[0]] if trailing else stop_price
+            exit_price = min(stop, c_open[child]) if child > first else stop
+            exit_bar = children.parent[child]
+            reason = EXIT_STOP
+            bar = exit_bar
+        elif signal_exit is not None:
+            child = last
+            exit_price = c_open[child] - skid * abs(c_open[child] - c_low[child])
+            exit_bar = signal_exit
+            reason = EXIT_SIGNAL
+            bar = exit_bar
+        else:
+            # Still open at the end
+            trade['exit_index'] = -1
+            trade['exit_price'] = np.nan
+            trade['min_low'] = np.nan
+            trade['trade_return'] = np.nan
+            trade['profit'] = np.nan
+            trade['equity'] = np.nan
+            break
+
+        trade_return = (exit_price - entry_price) / entry_price
+        profit = trade_return * position_size * entry_price
+        equity += profit
+
+        exit_prices[exit_bar] = exit_price
+        exit_reasons[exit_bar] = reason
+        trade_returns[exit_bar] = trade_return
+        profit_losses[exit_bar] = profit
+
+        trade['exit_index'] = exit_bar
+        trade['exit_price'] = exit_price
+        trade['reason'] = reason
+        trade['min_low'] = c_low[first:child + 1].min()
+        trade['trade_return'] = trade_return
+        trade['profit'] = profit
+        trade['equity'] = equity
+
+    return {
+        'entry_price': entry_prices,
+        'exit_price': exit_prices,
+        'exit_reason': exit_reasons,
+        'trade_return': trade_returns,
+        'profit_loss': profit_losses,
+        'position_size': position_sizes,
+        'equity': initial_capital + np.cumsum(profit_losses),
+        'trades': trades[:num_trades],
+    }
+
+
+class IntrabarBacktester(Backtester):
+    """
+    Backtester that resolves fills and stop hits on lower-timeframe bars
+    (e.g. 1m bars under 1h bars) instead of the parent bar's open and low.
+    child_df holds the lower-timeframe Open/High/Low with a DatetimeIndex.
+    """
+    def __init__(self, df: pd.DataFrame, child_df: pd.DataFrame, initial_capital=100000, skid=1.0, risk_manager: RiskManager=None, position_sizer: PositionSizer=None):
+        super().__init__(df, initial_capital, skid, risk_manager, position_sizer, engine="fast")
+        self.children = ChildBars(df, child_df)
+
+    @profiled("backtest", backtest_counts)
+    def run_backtest(self):
+        df = self.df
+        result = simulate_intrabar(
+            df['Signal'].to_numpy(), self.children,
+            self.initial_capital, self.skid, self.risk_manager, self.position_sizer,
+            df['ATR'].to_numpy() if 'ATR' in df else None
+        )
+
+        self.trades = result['trades']
+        self.df = df.assign(**result_columns(result))
+        return self.df
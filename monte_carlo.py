@@ -0,0 +1,123 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from position_sizer import PositionSizer
+
+METHODS = ("bootstrap", "shuffle")
+
+
+def _simulate_chunk(args):
+    """
+    Resample one chunk of paths and reduce each to final equity, max
+    drawdown and ruin %. Only the per-path results leave the chunk.
+    """
+    equity_returns, initial_capital, method, paths, seed = args
+    rng = np.random.default_rng(seed)
+    num_trades = len(equity_returns)
+
+    # (paths x trades) matrix of resampled per-trade equity returns
+    if method == "bootstrap":
+        sampled = equity_returns[rng.integers(0, num_trades, size=(paths, num_trades))]
+    else:
+        sampled = rng.permuted(np.broadcast_to(equity_returns, (paths, num_trades)), axis=1)
+
+    # Each trade's P&L is its sized return on the path's current equity
+    equity = np.empty((paths, num_trades + 1))
+    equity[:, 0] = initial_capital
+    np.cumprod(1 + sampled, axis=1, out=equity[:, 1:])
+    equity[:, 1:] *= initial_capital
+
+    max_drawdown = (equity / np.maximum.accumulate(equity, axis=1) - 1).min(axis=1)
+    ruin_pct = (initial_capital - equity.min(axis=1)) / initial_capital * 100
+    return equity[:, -1], max_drawdown, ruin_pct
+
+
+class MonteCarlo:
+    """
+    Monte Carlo analysis of a backtest's trade sequence.
+
+    Generates many alternative trade orderings, either bootstrapped (drawn
+    with replacement) or reshuffled, and compounds each path under the
+    position sizer: a trade earns trade_return x sizer.calculate(entry,
+    path equity, stop), the P&L the engines book for it. Both sizers
+    allocate in proportion to equity, so each trade is sized once on unit
+    equity and scaled by the path's equity as it compounds.
+    Paths are simulated as (paths x trades) NumPy matrices in fixed-size
+    chunks, so memory stays bounded, and chunks can run over processes.
+    Each chunk has its own seed, so results do not depend on max_workers.
+    """
+    def __init__(self, trade_returns, position_sizer: PositionSizer = None, initial_capital=100000, method="bootstrap",
+                 seed=None, entry_prices=None, stop_prices=None):
+        if method not in METHODS:
+            raise ValueError(f"Unknown method '{method}', expected one of {METHODS}")
+        trade_returns = np.asarray(trade_returns, dtype=np.float64)
+        entry_prices = np.ones(len(trade_returns)) if entry_prices is None else np.asarray(entry_prices, dtype=np.float64)
+        stop_prices = np.full(len(trade_returns), np.nan) if stop_prices is None else np.asarray(stop_prices, dtype=np.float64)
+        self.position_sizer = position_sizer or PositionSizer()
+
+        known = ~np.isnan(trade_returns)
+        # Capital the sizer allocates per unit of equity (stop NaN: no stop known)
+        allocation = np.array([
+            self.position_sizer.calculate(entry, 1.0, None if np.isnan(stop) else stop)
+            for entry, stop in zip(entry_prices[known], stop_prices[known])
+        ], dtype=np.float64)
+        self.equity_returns = trade_returns[known] * allocation
+        self.initial_capital = initial_capital
+        self.method = method
+        self.seed = seed
+
+    @classmethod
+    def from_trades(cls, trades: np.ndarray, **kwargs):
+        """
+        Build from engine trade records (Backtester.trades), re-sizing each
+        trade with its recorded entry and stop; open trades are skipped.
+        Pass the position_sizer the backtest used.
+        """
+        closed = trades[trades['exit_index'] >= 0]
+        return cls(closed['trade_return'], entry_prices=closed['entry_price'], stop_prices=closed['stop_price'], **kwargs)
+
+    def run(self, paths=10_000, ruin_thresholds=(10, 25, 50), chunk_size=10_000, max_workers=1):
+        """
+        Simulate `paths` trade sequences.
+
+        Returns a dict with per-path 'final_equity', 'max_drawdown' and
+        'ruin_pct' arrays, 'prob_ruin' (share of paths whose loss from
+        initial capital reached each threshold, in %) and a percentile
+        'summary' DataFrame.
+        """
+        if len(self.equity_returns) == 0:
+            raise ValueError("No trade returns to resample")
+
+        sizes = [chunk_size] * (paths // chunk_size) + ([paths % chunk_size] if paths % chunk_size else [])
+        seeds = np.random.SeedSequence(self.seed).spawn(len(sizes))
+        tasks = [
+            (self.equity_returns, self.initial_capital, self.method, size, seed)
+            for size, seed in zip(sizes, seeds)
+        ]
+
+        workers = max_workers or os.cpu_count() or 1
+        if workers == 1 or len(tasks) == 1:
+            chunks = [_simulate_chunk(task) for task in tasks]
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                chunks = list(pool.map(_simulate_chunk, tasks))
+
+        final_equity, max_drawdown, ruin_pct = (np.concatenate(parts) for parts in zip(*chunks))
+
+        summary = pd.DataFrame({
+            "Final Equity": final_equity,
+            "Max Drawdown": max_drawdown,
+            "Ruin %": ruin_pct,
+        }).quantile([0.05, 0.25, 0.5, 0.75, 0.95])
+        summary.index = [f"p{int(q * 100)}" for q in summary.index]
+
+        return {
+            "final_equity": final_equity,
+            "max_drawdown": max_drawdown,
+            "ruin_pct": ruin_pct,
+            "prob_ruin": {threshold: float(np.mean(ruin_pct >= threshold)) for threshold in ruin_thresholds},
+            "summary": summary,
+        }
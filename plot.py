@@ -1,17 +1,124 @@
 import plotly.graph_objects as go
+import numpy as np
 import pandas as pd
 import streamlit as st
+from backtester import EXIT_STOP
+from profiling import profiled
 
-def plot_trades(df):
+def _trade_markers(df, trades):
+    """
+    Entry, exit and stop-loss marker coordinates, from the engine's trade
+    records when given, otherwise by scanning the result columns.
+    """
+    if trades is not None:
+        closed = trades[trades['exit_index'] >= 0]
+        stops = closed[closed['reason'] == EXIT_STOP]
+        return (
+            (df.index[trades['entry_index']], trades['entry_price']),
+            (df.index[closed['exit_index']], closed['exit_price']),
+            (df.index[stops['exit_index']], stops['exit_price']),
+        )
+
+    entries = df.dropna(subset=['Trade Entry Price'])
+    exits = df.dropna(subset=['Trade Exit Price'])
+    stops = df[df['Exit Reason'] == 'Stop Loss']
+    return (
+        (entries.index, entries['Trade Entry Price']),
+        (exits.index, exits['Trade Exit Price']),
+        (stops.index, stops['Trade Exit Price']),
+    )
+
+def _buckets(n, max_points):
+    """
+    Start row of each contiguous bucket when n rows are cut into at most max_points.
+    """
+    size = max(1, -(-n // max(1, max_points)))
+    return np.arange(0, n, size)
+
+def downsample_ohlc(df, max_bars):
+    """
+    Aggregate consecutive bars into at most max_bars OHLC candles (first
+    open, highest high, lowest low, last close), each stamped with the time
+    of its first bar. Extremes are never lost.
+    """
+    if len(df) <= max_bars:
+        return df[['Open', 'High', 'Low', 'Close']]
+    starts = _buckets(len(df), max_bars)
+    ends = np.append(starts[1:], len(df)) - 1
+    return pd.DataFrame({
+        'Open': df['Open'].to_numpy()[starts],
+        'High': np.fmax.reduceat(df['High'].to_numpy(dtype=np.float64), starts),
+        'Low': np.fmin.reduceat(df['Low'].to_numpy(dtype=np.float64), starts),
+        'Close': df['Close'].to_numpy()[ends],
+    }, index=df.index[starts])
+
+def downsample_minmax(series, max_points):
+    """
+    Keep each bucket's lowest and highest point of a line, in time order,
+    so at most max_points points remain and peaks and troughs survive.
+    """
+    if len(series) <= max_points:
+        return series.index, series.to_numpy()
+    values = series.to_numpy(dtype=np.float64)
+    size = -(-len(values) // max(1, max_points // 2))
+    padded = np.full(-(-len(values) // size) * size, np.nan)
+    padded[:len(values)] = values
+    blocks = padded.reshape(-1, size)
+
+    # All-NaN buckets (indicator warm-up) fall back to their first row
+    offsets = np.arange(0, len(padded), size)
+    lows = np.where(np.isnan(blocks), np.inf, blocks).argmin(axis=1) + offsets
+    highs = np.where(np.isnan(blocks), -np.inf, blocks).argmax(axis=1) + offsets
+    keep = np.unique(np.minimum(np.concatenate([lows, highs]), len(values) - 1))
+    return series.index[keep], values[keep]
+
+def _in_window(marker, start, end):
+    """
+    Marker coordinates between start and end (inclusive).
+    """
+    x, y = marker
+    x = pd.DatetimeIndex(x)
+    mask = np.ones(len(x), dtype=bool)
+    if start is not None:
+        mask &= x >= start
+    if end is not None:
+        mask &= x <= end
+    return x[mask], np.asarray(y)[mask]
+
+@profiled("plot", lambda args, result: {"bars": len(args[0])})
+def plot_trades(df, trades=None, max_bars=None, window=None):
+    """
+    Candlestick chart with indicator lines and trade markers.
+
+    With max_bars set the chart is drawn at a bounded level of detail: the
+    bars inside window (start, end), or all bars, become at most max_bars
+    aggregated candles, indicator lines keep each bucket's min and max, and
+    lines and markers are drawn with WebGL. Trade markers stay exact.
+    """
     fig = go.Figure()
+    entries, exits, stops = _trade_markers(df, trades)
+
+    scatter = go.Scatter
+    bars = df
+    if max_bars is not None:
+        scatter = go.Scattergl
+        start, end = window if window is not None else (None, None)
+        df = df.loc[start:end]
+        bars = downsample_ohlc(df, max_bars)
+        entries, exits, stops = (_in_window(marker, start, end) for marker in (entries, exits, stops))
+
+    def line(column):
+        if max_bars is None:
+            return df.index, df[column]
+        return downsample_minmax(df[column], 2 * max_bars)
 
     # Candlestick chart
     fig.add_trace(go.Candlestick(
-        x=df.index,
-        open=df['Open'],
-        high=df['High'],
-        low=df['Low'],
-        close=df['Close'],
+        x=bars.index,
+        open=bars['Open'],
+        high=bars['High'],
+        low=bars['Low'],
+        close=bars['Close'],
         name='Price',
         increasing_line_color='green',
         decreasing_line_color='red'
@@ -19,9 +126,10 @@ def plot_trades(df):
 
     # EMA Short
     if 'EMA_Short' in df.columns:
-        fig.add_trace(go.Scatter(
-            x=df.index,
-            y=df['EMA_Short'],
+        x, y = line('EMA_Short')
+        fig.add_trace(scatter(
+            x=x,
+            y=y,
             mode='lines',
             line=dict(color='orange', width=1.5),
             name='EMA Short'
@@ -29,19 +137,42 @@ def plot_trades(df):
 
     # EMA Long
     if 'EMA_Long' in df.columns:
-        fig.add_trace(go.Scatter(
-            x=df.index,
-            y=df['EMA_Long'],
+        x, y = line('EMA_Long')
+        fig.add_trace(scatter(
+            x=x,
+            y=y,
             mode='lines',
             line=dict(color='blue', width=1.5),
             name='EMA Long'
         ))
 
+    # Higher-timeframe trend EMA
+    if 'Trend_EMA' in df.columns:
+        x, y = line('Trend_EMA')
+        fig.add_trace(scatter(
+            x=x,
+            y=y,
+            mode='lines',
+            line=dict(color='gray', width=1.5, dash='dash'),
+            name='Trend EMA'
+        ))
+
+    # Keltner channel
+    for column, name, dash in [('KC_Upper', 'KC Upper', 'dot'), ('KC_Middle', 'KC Middle', None), ('KC_Lower', 'KC Lower', 'dot')]:
+        if column in df.columns:
+            x, y = line(column)
+            fig.add_trace(scatter(
+                x=x,
+                y=y,
+                mode='lines',
+                line=dict(color='purple', width=1, dash=dash),
+                name=name
+            ))
+
     # Entry signals
-    entries = df.dropna(subset=['Trade Entry Price'])
-    fig.add_trace(go.Scatter(
-        x=entries.index,
-        y=entries['Trade Entry Price'],
+    fig.add_trace(scatter(
+        x=entries[0],
+        y=entries[1],
         mode='markers',
         marker=dict(color='orange', size=14, symbol='triangle-up'),
         name='Buy Entries',
@@ -49,10 +180,9 @@ def plot_trades(df):
     ))
 
     # Exit signals
-    exits = df.dropna(subset=['Trade Exit Price'])
-    fig.add_trace(go.Scatter(
-        x=exits.index,
-        y=exits['Trade Exit Price'],
+    fig.add_trace(scatter(
+        x=exits[0],
+        y=exits[1],
         mode='markers',
         marker=dict(color='blue', size=14, symbol='triangle-down'),
         name='Sell Exits',
@@ -60,24 +190,25 @@ def plot_trades(df):
     ))
 
     # Stop-loss exits
-    stops = df[df['Exit Reason'] == 'Stop Loss']
-    fig.add_trace(go.Scatter(
-        x=stops.index,
-        y=stops['Trade Exit Price'],
+    fig.add_trace(scatter(
+        x=stops[0],
+        y=stops[1],
         mode='markers+text',
         marker=dict(color='red', size=10, symbol='x'),
-        text=['SL'] * len(stops),
+        text=['SL'] * len(stops[0]),
         textposition='top center',
         name='Stop Loss'
     ))
 
     # Clean up index
     df.index = pd.to_datetime(df.index, errors='coerce')
-    df = df[df.index >= df.index[0]]
+    if len(df):
+        df = df[df.index >= df.index[0]]
     df = df[~df.index.isna()]
     df = df.sort_index()
 
-    x_range = [df.index.min(), df.index.max()]
+    # A window past the data (or a frame with no bars) leaves an empty chart
+    x_range = [df.index.min(), df.index.max()] if len(df) else None
 
     # Layout settings
     fig.update_layout(
@@ -0,0 +1,210 @@
+import heapq
+
+import numpy as np
+import pandas as pd
+
+from backtester import TRADE_DTYPE, EXIT_STOP, EXIT_SIGNAL
+from indicators import IndicatorCalculator
+from position_sizer import PositionSizer
+from risk_manager import RiskManager
+
+# Engine trade records tagged with the pair they belong to. entry_index and
+# exit_index are positions on the merged portfolio timeline.
+PORTFOLIO_TRADE_DTYPE = np.dtype([('pair', np.int64)] + TRADE_DTYPE.descr)
+
+
+def _timestamps(index) -> np.ndarray:
+    """
+    int64 nanoseconds (UTC for tz-aware indexes) of a DatetimeIndex.
+    """
+    return pd.DatetimeIndex(index).as_unit('ns').asi8
+
+
+def merge_timelines(timestamps) -> np.ndarray:
+    """
+    k-way merge of already sorted int64 timestamp arrays into one unique
+    timeline. The stable sort is a timsort, which finds the k sorted runs
+    and merges them instead of re-sorting from scratch.
+    """
+    merged = np.sort(np.concatenate(timestamps), kind='stable')
+    if len(merged) == 0:
+        return merged
+    keep = np.empty(len(merged), dtype=bool)
+    keep[0] = True
+    np.not_equal(merged[1:], merged[:-1], out=keep[1:])
+    return merged[keep]
+
+
+class PortfolioBacktester:
+    """
+    Multi-pair backtest sharing one equity pool.
+
+    Each pair trades the EMA crossover on its own bars with the same
+    entry/exit/stop rules as Backtester. Bars are placed on one timeline by
+    merging the pairs' sorted timestamps, and every pair's signal bars are
+    merged into a single chronological event stream, so the engine only
+    visits bars where something can happen. Entries are sized with the
+    PositionSizer on the portfolio's realized equity at the signal bar;
+    each open position keeps its own stop from its pair's RiskManager.
+
+    data maps symbol -> DataFrame with a DatetimeIndex and Open/High/Low/Close
+    (plus Signal, otherwise it is computed with the indicator).
+    risk_manager is one RiskManager for every pair or a dict per symbol;
+    'atr' stops are not supported.
+    """
+    def __init__(self, data: dict, indicator: IndicatorCalculator = None, initial_capital=100000, skid=1.0,
+                 risk_manager=None, position_sizer: PositionSizer = None):
+        if not data:
+            raise ValueError("At least one pair is required")
+        self.data = data
+        self.symbols = list(data)
+        self.indicator = indicator or IndicatorCalculator()
+        self.initial_capital = initial_capital
+        self.skid = skid
+        if isinstance(risk_manager, dict):
+            missing = set(self.symbols) - set(risk_manager)
+            if missing:
+                raise ValueError(f"No RiskManager for {sorted(missing)}")
+            self.risk_managers = [risk_manager[symbol] for symbol in self.symbols]
+        else:
+            self.risk_managers = [risk_manager or RiskManager()] * len(self.symbols)
+        if any(rm.get_stop_loss_type() == 'atr' for rm in self.risk_managers):
+            # Entries are placed from merged signal events without each pair's ATR,
+            # so the stop would silently fall back to stop_loss_pct
+            raise ValueError("PortfolioBacktester does not support 'atr' stops")
+        self.position_sizer = position_sizer or PositionSizer()
+        self.timeline = None
+        self.trades = None
+
+    def _signals(self, df):
+        if 'Signal' in df:
+            return df['Signal'].to_numpy()
+        return self.indicator.ema_crossover_arrays(df['Close'])['Signal']
+
+    def run_backtest(self) -> pd.DataFrame:
+        """
+        Returns a DataFrame on the merged timeline with each pair's cumulative
+        realized P&L (one column per symbol) and the portfolio 'Equity'.
+        Trade records are kept in self.trades.
+        """
+        stamps = [_timestamps(self.data[symbol].index) for symbol in self.symbols]
+        timeline = merge_timelines(stamps)
+        # Each pair's bar -> its position on the shared timeline
+        positions = [np.searchsorted(timeline, s) for s in stamps]
+
+        opens, highs, lows, event_parts = [], [], [], []
+        for pair, symbol in enumerate(self.symbols):
+            df = self.data[symbol]
+            opens.append(df['Open'].to_numpy(dtype=np.float64))
+            highs.append(df['High'].to_numpy(dtype=np.float64))
+            lows.append(df['Low'].to_numpy(dtype=np.float64))
+            signal = self._signals(df)
+            # As in Backtester, the last bar is never acted on
+            bars = np.flatnonzero(signal[:max(len(df) - 1, 0)])
+            event_parts.append((positions[pair][bars], np.full(len(bars), pair), bars, signal[bars]))
+
+        # Merge all pairs' signal bars into one stream, ties in pair order
+        event_pos, event_pair, event_bar, event_signal = (np.concatenate(parts) for parts in zip(*event_parts))
+        order = np.argsort(event_pos, kind='stable')
+
+        k = len(self.symbols)
+        in_position = [False] * k
+        open_trade = [None] * k
+        stop_price = [None] * k
+        trailing = [rm.get_stop_loss_type() == 'trailing' for rm in self.risk_managers]
+        trades = []
+
+        equity = self.initial_capital
+        # Signal exits fill on the pair's next bar: (timeline position, profit)
+        pending = []
+
+        for e in order:
+            pos, pair, i, sig = event_pos[e], event_pair[e], event_bar[e], event_signal[e]
+            while pending and pending[0][0] <= pos:
+                equity += heapq.heappop(pending)[1]
+
+            if not in_position[pair] and sig == 1:
+                next_open = opens[pair][i + 1]
+                entry_price = next_open + self.skid * abs(highs[pair][i + 1] - next_open)
+                stop_price[pair] = self.risk_managers[pair].get_stop_price(entry_price)
+                allocated = self.position_sizer.calculate(entry_price, equity, stop_price[pair])
+                trade = np.zeros((), dtype=PORTFOLIO_TRADE_DTYPE)
+                trade['pair'] = pair
+                trade['entry_index'] = positions[pair][i + 1]
+                trade['entry_price'] = entry_price
+                trade['size'] = allocated / entry_price
+                trade['stop_price'] = stop_price[pair]
+                open_trade[pair] = trade
+                in_position[pair] = True
+
+            elif in_position[pair] and sig == -1:
+                risk_manager = self.risk_managers[pair]
+                trade = open_trade[pair]
+                entry_bar = np.searchsorted(positions[pair], trade['entry_index'])
+                if trailing[pair]:
+                    stop_price[pair] = risk_manager.update_trailing_stop(stop_price[pair], highs[pair][i])
+
+                if risk_manager.check_stop(lows[pair][i], stop_price[pair]):
+                    exit_price = stop_price[pair]
+                    exit_bar = i
+                    trade['reason'] = EXIT_STOP
+                else:
+                    next_open = opens[pair][i + 1]
+                    exit_price = next_open - self.skid * abs(next_open - lows[pair][i + 1])
+                    exit_bar = i + 1
+                    trade['reason'] = EXIT_SIGNAL
+
+                entry_price = trade['entry_price']
+                trade_return = (exit_price - entry_price) / entry_price
+                profit = trade_return * trade['size'] * entry_price
+                exit_pos = positions[pair][exit_bar]
+                if exit_pos <= pos:
+                    equity += profit
+                else:
+                    heapq.heappush(pending, (exit_pos, profit))
+
+                trade['exit_index'] = exit_pos
+                trade['exit_price'] = exit_price
+                trade['min_low'] = np.nanmin(lows[pair][entry_bar:exit_bar + 1])
+                trade['trade_return'] = trade_return
+                trade['profit'] = profit
+                trades.append(trade)
+
+                in_position[pair] = False
+                open_trade[pair] = None
+                stop_price[pair] = None
+
+        # Keep positions still open at the end so their entries are not lost
+        for pair in range(k):
+            if in_position[pair]:
+                trade = open_trade[pair]
+                trade['exit_index'] = -1
+                for field in ('exit_price', 'min_low', 'trade_return', 'profit', 'equity'):
+                    trade[field] = np.nan
+                trades.append(trade)
+
+        records = np.array(trades, dtype=PORTFOLIO_TRADE_DTYPE) if trades else np.zeros(0, dtype=PORTFOLIO_TRADE_DTYPE)
+        closed = records[records['exit_index'] >= 0]
+
+        # Realized P&L per pair on the timeline, accumulated into curves
+        pnl = np.zeros((len(timeline), k))
+        np.add.at(pnl, (closed['exit_index'], closed['pair']), closed['profit'])
+        pair_pnl = np.cumsum(pnl, axis=0)
+        portfolio_equity = self.initial_capital + pair_pnl.sum(axis=1)
+
+        # Portfolio equity after each closed trade, in the order they realized
+        if len(closed):
+            order = np.lexsort((closed['pair'], closed['exit_index']))
+            closed['equity'][order] = self.initial_capital + np.cumsum(closed['profit'][order])
+            records[records['exit_index'] >= 0] = closed
+
+        index = pd.DatetimeIndex(timeline.view('datetime64[ns]'))
+        tz = pd.DatetimeIndex(self.data[self.symbols[0]].index).tz
+        if tz is not None:
+            index = index.tz_localize('UTC').tz_convert(tz)
+
+        self.timeline = index
+        self.trades = records
+        result = pd.DataFrame(pair_pnl, index=index, columns=self.symbols)
+        result['Equity'] = portfolio_equity
+        return result
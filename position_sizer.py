@@ -5,7 +5,7 @@ class PositionSizer:
     def __init__(self, position_pct=0.01):
         self.position_pct = position_pct
 
-    def calculate(self, entry_price, current_equity):
+    def calculate(self, entry_price, current_equity, stop_price=None):
         """
         Calculate position size based on current equity and entry price.
         """
@@ -18,3 +18,26 @@ class PositionSizer:
         # Convert capital to position size (shares/units)
         position_size = capital_to_allocate / entry_price
         return position_size
+
+
+class VolatilityPositionSizer(PositionSizer):
+    """
+    Sizes positions so that a stop-out loses risk_equity of current equity.
+    Returns the capital to allocate (the engines divide it by entry_price
+    for the units), and falls back to the fixed percentage sizing when
+    there is no stop below entry.
+    """
+    def __init__(self, risk_equity=0.01, position_pct=0.01):
+        super().__init__(position_pct)
+        self.risk_equity = risk_equity
+
+    def calculate(self, entry_price, current_equity, stop_price=None):
+        """
+        Calculate position size from the distance between entry and stop.
+        """
+        if stop_price is None or not entry_price > stop_price:
+            return super().calculate(entry_price, current_equity)
+
+        # Units whose loss at the stop equals the risked capital, as capital
+        units = current_equity * self.risk_equity / (entry_price - stop_price)
+        return units * entry_price
@@ -0,0 +1,201 @@
+"""
+Opt-in per-stage instrumentation for the backtest pipeline.
+
+Pipeline entry points are wrapped with @profiled(stage). While no Profiler
+is active the wrapper is one context variable lookup and a direct call,
+so the overhead when disabled is near zero. The active Profiler is per
+thread (a ContextVar), so concurrent Streamlit sessions never record into
+each other's profiles. Inside `with Profiler():` every call
+records wall time, bars and trades processed and, with memory=True, net
+and peak traced allocations. cprofile=True also captures a cProfile of
+the whole block.
+
+tracemalloc is process-wide: the first memory Profiler entered starts it
+and the last one to exit stops it. Sessions profiling memory at the same
+time each see the others' allocations in their alloc/peak figures.
+
+    with Profiler(memory=True) as profiler:
+        df = DataLoaderTW(path).get_data()
+        ...
+    print(profiler.report())
+"""
+import cProfile
+import contextvars
+import functools
+import io
+import pstats
+import threading
+import time
+import tracemalloc
+
+import pandas as pd
+
+# The Profiler currently collecting in this thread / context, if any
+_active = contextvars.ContextVar("profiler", default=None)
+
+# Memory Profilers currently inside their block, across all threads
+_tracing_lock = threading.Lock()
+_tracing_users = 0
+_started_tracing = False
+
+
+def _frame_bars(args, result):
+    """
+    Default counters: rows of a returned DataFrame.
+    """
+    return {"bars": len(result)} if isinstance(result, pd.DataFrame) else {}
+
+
+def profiled(stage, counters=_frame_bars):
+    """
+    Decorator recording each call under `stage` while a Profiler is active.
+    counters(args, result) returns extra counts such as bars and trades.
+    """
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            profiler = _active.get()
+            if profiler is None:
+                return fn(*args, **kwargs)
+            return profiler.call(stage, counters, fn, args, kwargs)
+        return wrapper
+    return decorator
+
+
+def _acquire_tracing():
+    """
+    Register a memory Profiler, starting tracemalloc for the first one.
+    """
+    global _tracing_users, _started_tracing
+    with _tracing_lock:
+        if _tracing_users == 0 and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            _started_tracing = True
+        _tracing_users += 1
+
+
+def _release_tracing():
+    """
+    Unregister a memory Profiler; the last one stops tracing it started.
+    """
+    global _tracing_users, _started_tracing
+    with _tracing_lock:
+        _tracing_users -= 1
+        if _tracing_users == 0 and _started_tracing:
+            tracemalloc.stop()
+            _started_tracing = False
+
+
+class Profiler:
+    """
+    Collects per-stage telemetry for calls made inside its `with` block.
+    A Profiler can be entered again later; records and wall time accumulate.
+    """
+    def __init__(self, memory=False, cprofile=False):
+        self.memory = memory
+        self.cprofile = cprofile
+        self.records = []
+        self.wall_time = 0.0
+        self._stack = []
+        self._profile = None
+        self._tracing = False
+        self._token = None
+        self._start = None
+
+    def __enter__(self):
+        self._token = _active.set(self)
+        if self.memory:
+            _acquire_tracing()
+            self._tracing = True
+        if self.cprofile:
+            if self._profile is None:
+                self._profile = cProfile.Profile()
+            self._profile.enable()
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.wall_time += time.perf_counter() - self._start
+        if self._profile is not None:
+            self._profile.disable()
+        if self._tracing:
+            _release_tracing()
+            self._tracing = False
+        _active.reset(self._token)
+        return False
+
+    def call(self, stage, counters, fn, args, kwargs):
+        """
+        Run fn and record one telemetry row for it.
+        """
+        tracing = self.memory and tracemalloc.is_tracing()
+        if tracing:
+            start_mem, peak = tracemalloc.get_traced_memory()
+            if self._stack:
+                self._stack[-1]["peak"] = max(self._stack[-1]["peak"], peak)
+            tracemalloc.reset_peak()
+        # Peak seen by stages nested inside this one (reset_peak clears it)
+        frame = {"peak": 0}
+        self._stack.append(frame)
+
+        start = time.perf_counter()
+        try:
+            result = fn(*args, **kwargs)
+        finally:
+            seconds = time.perf_counter() - start
+            self._stack.pop()
+
+        record = {"stage": stage, "seconds": seconds, "bars": None, "trades": None}
+        if tracing:
+            current, peak = tracemalloc.get_traced_memory()
+            peak = max(peak, frame["peak"])
+            if self._stack:
+                self._stack[-1]["peak"] = max(self._stack[-1]["peak"], peak)
+            record["alloc_mb"] = (current - start_mem) / 2**20
+            record["peak_mb"] = (peak - start_mem) / 2**20
+        record.update(counters(args, result))
+        self.records.append(record)
+        return result
+
+    def report(self) -> pd.DataFrame:
+        """
+        One row per stage: calls, total seconds, bars and trades processed,
+        bars/second and (with memory=True) net and peak allocations in MB.
+        """
+        columns = ["calls", "seconds", "bars", "trades", "bars_per_sec"]
+        if self.memory:
+            columns += ["alloc_mb", "peak_mb"]
+        if not self.records:
+            return pd.DataFrame(columns=columns)
+
+        records = pd.DataFrame(self.records)
+        records["calls"] = 1
+        stages = records.groupby("stage", sort=False)
+        report = stages[["calls", "seconds"]].sum()
+        for column in ("bars", "trades"):
+            report[column] = stages[column].sum(min_count=1)
+        if self.memory:
+            report["alloc_mb"] = stages["alloc_mb"].sum()
+            report["peak_mb"] = stages["peak_mb"].max()
+        report["bars_per_sec"] = report["bars"] / report["seconds"]
+        return report[columns]
+
+    def to_dict(self) -> dict:
+        """
+        JSON-friendly run telemetry: total wall time, per-call records and the stage report.
+        """
+        return {
+            "wall_time": self.wall_time,
+            "records": self.records,
+            "stages": self.report().reset_index().to_dict(orient="records"),
+        }
+
+    def cprofile_stats(self, sort="cumulative", limit=30) -> str:
+        """
+        Text table of the cProfile capture (cprofile=True), top `limit` functions.
+        """
+        if self._profile is None:
+            return ""
+        out = io.StringIO()
+        pstats.Stats(self._profile, stream=out).sort_stats(sort).print_stats(limit)
+        return out.getvalue()
@@ -0,0 +1,131 @@
+import numpy as np
+import pandas as pd
+
+FIELDS = ('Open', 'High', 'Low', 'Close', 'Volume')
+
+DAY = pd.Timedelta(days=1).value
+# 1970-01-01, the zero of the nanosecond timeline, was a Thursday
+EPOCH_WEEKDAY = 3
+
+
+def _step(rule) -> int:
+    """
+    Fixed bar length of a resampling rule ("4h", "1D", "15min") in nanoseconds.
+    """
+    try:
+        step = pd.Timedelta(rule).value
+    except ValueError:
+        raise ValueError(f"Unsupported timeframe '{rule}', expected a fixed length such as '4h' or '1D', "
+                         f"or a week such as '1W'") from None
+    if step <= 0:
+        raise ValueError(f"Timeframe '{rule}' must be positive")
+    return step
+
+
+def _grid(rule, first) -> tuple:
+    """
+    (origin, step, label shift) in nanoseconds of a rule's buckets, placed
+    as DataFrame.resample places them: fixed lengths count from midnight of
+    the first bar's day (origin 'start_day'); weeks ('1W', 'W-FRI', ...)
+    are calendar weeks ending on the anchor day (Sunday by default) and
+    are labelled by that day.
+    """
+    try:
+        offset = pd.tseries.frequencies.to_offset(rule)
+    except ValueError:
+        offset = None
+    if isinstance(offset, pd.offsets.Week) and offset.weekday is not None:
+        if offset.n != 1:
+            raise ValueError(f"Timeframe '{rule}' must span a single week")
+        start_weekday = (offset.weekday + 1) % 7
+        return ((start_weekday - EPOCH_WEEKDAY) % 7) * DAY, 7 * DAY, 6 * DAY
+    return first - first % DAY, _step(rule), 0
+
+
+class Resampler:
+    """
+    Resamples one base OHLCV frame to higher timeframes without extra I/O.
+
+    Bars are bucketed on their wall-clock start times with the bins and
+    labels of DataFrame.resample (see _grid), each timeframe in one pass of NumPy reductions, and every
+    resampled frame is cached. align() maps higher-timeframe values back
+    onto the base bars without lookahead: a base bar only sees higher-
+    timeframe bars that had closed by the end of that base bar.
+    """
+    def __init__(self, df: pd.DataFrame):
+        index = pd.DatetimeIndex(df.index)
+        if index.tz is not None:
+            index = index.tz_localize(None)
+        if not index.is_monotonic_increasing:
+            raise ValueError("Base bars must be in time order")
+        self.df = df
+        self.time = index.as_unit('ns').asi8
+        # Length of one base bar, taken as the typical spacing
+        self.base_step = int(np.median(np.diff(self.time))) if len(self.time) > 1 else 0
+        self._cache = {}
+
+    def _bins(self, rule):
+        """
+        (resampled frame, row of each base bar, whether that row has closed
+        by the end of the base bar), computed once per timeframe.
+        """
+        if rule not in self._cache:
+            origin, step, label = _grid(rule, self.time[0] if len(self.time) else 0)
+            if step < self.base_step:
+                raise ValueError(f"Timeframe '{rule}' is shorter than the base bars")
+            bucket = (self.time - origin) // step
+            new = np.ones(len(bucket), dtype=bool)
+            np.not_equal(bucket[1:], bucket[:-1], out=new[1:])
+            starts = np.flatnonzero(new)
+            ends = np.append(starts[1:], len(bucket)) - 1
+            row = np.cumsum(new) - 1
+            closed = self.time + self.base_step >= origin + (bucket + 1) * step
+
+            columns = {}
+            for field in FIELDS:
+                if field not in self.df:
+                    continue
+                values = self.df[field].to_numpy(dtype=np.float64)
+                if not len(values):
+                    columns[field] = values
+                elif field == 'Open':
+                    columns[field] = values[starts]
+                elif field == 'High':
+                    columns[field] = np.maximum.reduceat(values, starts)
+                elif field == 'Low':
+                    columns[field] = np.minimum.reduceat(values, starts)
+                elif field == 'Close':
+                    columns[field] = values[ends]
+                else:
+                    columns[field] = np.add.reduceat(values, starts)
+
+            index = pd.DatetimeIndex((origin + bucket[starts] * step + label).view('datetime64[ns]'), name=self.df.index.name)
+            if self.df.index.tz is not None:
+                index = index.tz_localize(self.df.index.tz)
+            self._cache[rule] = (pd.DataFrame(columns, index=index), row, closed)
+        return self._cache[rule]
+
+    def resample(self, *rules):
+        """
+        OHLCV bars for one timeframe, or a dict of frames for several,
+        labelled like DataFrame.resample (weeks by their last day, other
+        rules by their bucket start). Buckets without bars are left out.
+        """
+        frames = {rule: self._bins(rule)[0] for rule in rules}
+        return frames[rules[0]] if len(rules) == 1 else frames
+
+    def align(self, rule, values) -> np.ndarray:
+        """
+        Per-base-bar values of a series computed on resample(rule): each base
+        bar gets the value of the latest higher-timeframe bar that had closed
+        by the end of the base bar (NaN before the first one closes).
+        """
+        frame, row, closed = self._bins(rule)
+        values = np.asarray(values, dtype=np.float64)
+        if len(values) != len(frame):
+            raise ValueError(f"Expected {len(frame)} values for '{rule}', got {len(values)}")
+        latest = np.where(closed, row, row - 1)
+        aligned = np.full(len(row), np.nan)
+        known = latest >= 0
+        aligned[known] = values[latest[known]]
+        return aligned
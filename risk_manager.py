@@ -1,13 +1,25 @@
 class RiskManager:
-    def __init__(self, stop_loss_pct=0.25, stop_loss_type='fixed'):
+    def __init__(self, stop_loss_pct=0.25, stop_loss_type='fixed', atr_multiplier=1.0, initial_risk=None):
         self.stop_loss_pct = stop_loss_pct
         self.stop_loss_type = stop_loss_type
+        self.atr_multiplier = atr_multiplier
+        self.initial_risk = initial_risk
 
-    def get_stop_price(self, entry_price):
+    def get_stop_price(self, entry_price, atr=None):
         """
         Calculate initial stop loss price below entry.
-        """
-        return entry_price * (1 - self.stop_loss_pct)
+        With the 'atr' type the stop sits atr_multiplier x ATR below entry
+        (falling back to stop_loss_pct while ATR is unknown); initial_risk
+        caps how far below entry, as a fraction of price, any stop may sit.
+        """
+        if self.stop_loss_type == 'atr' and atr is not None and atr == atr:
+            stop_price = entry_price - self.atr_multiplier * atr
+        else:
+            stop_price = entry_price * (1 - self.stop_loss_pct)
+
+        if self.initial_risk:
+            stop_price = max(stop_price, entry_price * (1 - self.initial_risk))
+        return stop_price
 
     def update_trailing_stop(self, stop_price, current_high):
         """
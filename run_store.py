@@ -0,0 +1,204 @@
+import hashlib
+import io
+import json
+import os
+import sqlite3
+import time
+import zlib
+from contextlib import closing
+
+import numpy as np
+import pandas as pd
+
+from data_cache import DEFAULT_CACHE_DIR
+
+DEFAULT_RUN_DB = os.path.join(DEFAULT_CACHE_DIR, "runs.sqlite")
+
+# metrics_from_arrays() keys, stored as one indexed-friendly column each
+METRICS = (
+    "initial_capital", "final_equity", "total_pnl", "total_trades", "win_rate", "avg_pl",
+    "sharpe_ratio", "max_drawdown", "ruin_pct", "profit_factor", "expectancy", "cagr", "time_in_market",
+)
+
+# Metrics queries usually rank or filter on
+INDEXED = ("sharpe_ratio", "max_drawdown", "total_pnl", "cagr", "profit_factor")
+
+
+def run_params(risk_manager=None, position_sizer=None, **params) -> dict:
+    """
+    Parameter dict of a backtest: strategy parameters plus the
+    RiskManager/PositionSizer settings.
+    """
+    if risk_manager is not None:
+        params["risk_manager"] = vars(risk_manager)
+    if position_sizer is not None:
+        params["position_sizer"] = dict(vars(position_sizer), type=type(position_sizer).__name__)
+    return params
+
+
+def _pack(array) -> bytes:
+    """
+    zlib-compressed .npy bytes (keeps dtype and shape, no pickle).
+    """
+    buffer = io.BytesIO()
+    np.save(buffer, np.asarray(array), allow_pickle=False)
+    return zlib.compress(buffer.getvalue())
+
+
+def _unpack(blob) -> np.ndarray:
+    return np.load(io.BytesIO(zlib.decompress(blob)), allow_pickle=False)
+
+
+class RunStore:
+    """
+    SQLite store of backtest and sweep results.
+
+    Each run is keyed by a hash of the dataset fingerprint, strategy and
+    parameters (see key()). Metrics live in the `runs` table with one column
+    per metric and indexes on the common ranking metrics, so queries never
+    touch the compressed equity curves and trade records, which are kept in
+    a separate `arrays` table and loaded one run at a time.
+    """
+    def __init__(self, path=DEFAULT_RUN_DB):
+        self.path = path
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        with self._connect() as db:
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS runs (run_id TEXT PRIMARY KEY, dataset TEXT, strategy TEXT, "
+                "params TEXT, created REAL, "
+                + ", ".join(f"{name} {'INTEGER' if name == 'total_trades' else 'REAL'}" for name in METRICS) + ")"
+            )
+            db.execute("CREATE TABLE IF NOT EXISTS arrays (run_id TEXT PRIMARY KEY, equity BLOB, trades BLOB)")
+            db.execute("CREATE INDEX IF NOT EXISTS runs_dataset ON runs (dataset, strategy)")
+            for name in INDEXED:
+                db.execute(f"CREATE INDEX IF NOT EXISTS runs_{name} ON runs ({name})")
+
+    def _connect(self):
+        """
+        A fresh connection per call, so one store can be shared across
+        threads and processes.
+        """
+        return _Connection(self.path)
+
+    @staticmethod
+    def key(dataset, strategy, params) -> str:
+        """
+        run_id of one run: hash of the data fingerprint, strategy and parameters.
+        """
+        text = json.dumps([dataset, strategy, params], sort_keys=True, default=str)
+        return hashlib.blake2b(text.encode(), digest_size=16).hexdigest()
+
+    def existing(self, run_ids) -> set:
+        """
+        The run_ids among `run_ids` that are already stored.
+        """
+        run_ids = list(run_ids)
+        found = set()
+        with self._connect() as db:
+            # Stay under SQLite's bound-parameter limit
+            for i in range(0, len(run_ids), 500):
+                chunk = run_ids[i:i + 500]
+                rows = db.execute(f"SELECT run_id FROM runs WHERE run_id IN ({','.join('?' * len(chunk))})", chunk)
+                found.update(run_id for run_id, in rows)
+        return found
+
+    def insert(self, runs) -> int:
+        """
+        Batch-insert runs in one transaction, skipping run_ids already stored.
+        Each run is a dict with run_id, dataset, strategy, params and metrics,
+        and optionally equity and trades arrays. Returns the rows inserted.
+        """
+        now = time.time()
+        run_rows, array_rows = [], []
+        for run in runs:
+            metrics = run["metrics"]
+            run_rows.append((run["run_id"], run["dataset"], run["strategy"], json.dumps(run["params"], default=str), now,
+                             *(metrics.get(name) for name in METRICS)))
+            if run.get("equity") is not None or run.get("trades") is not None:
+                array_rows.append((run["run_id"],
+                                   None if run.get("equity") is None else _pack(run["equity"]),
+                                   None if run.get("trades") is None else _pack(run["trades"])))
+
+        with self._connect() as db:
+            before = db.total_changes
+            db.executemany(f"INSERT OR IGNORE INTO runs VALUES ({','.join('?' * (5 + len(METRICS)))})", run_rows)
+            inserted = db.total_changes - before
+            db.executemany("INSERT OR IGNORE INTO arrays VALUES (?, ?, ?)", array_rows)
+        return inserted
+
+    def query(self, where=None, args=(), order_by="sharpe_ratio", ascending=False, limit=20) -> pd.DataFrame:
+        """
+        Metrics of stored runs as a DataFrame, e.g. the top 20 by Sharpe with
+        drawdown above -10%:
+
+            store.query("max_drawdown > ?", (-0.10,), order_by="sharpe_ratio", limit=20)
+
+        where is an SQL condition on the runs columns (metrics, dataset,
+        strategy, and params via json_extract(params, '$.name')).
+        """
+        if order_by not in METRICS + ("created",):
+            raise ValueError(f"Unknown metric '{order_by}'")
+        sql = "SELECT * FROM runs"
+        if where:
+            sql += f" WHERE {where}"
+        # NULLs sort first in SQLite, so DESC already puts them last and the
+        # metric's index serves the sort; only ASC needs NULLS LAST (SQLite 3.30+)
+        sql += f" ORDER BY {order_by} " + ("ASC NULLS LAST" if ascending else "DESC")
+        if limit is not None:
+            sql += " LIMIT ?"
+            args = tuple(args) + (int(limit),)
+        with self._connect() as db:
+            results = pd.read_sql_query(sql, db, params=tuple(args))
+        results["params"] = results["params"].map(json.loads)
+        return results
+
+    def get(self, run_ids) -> pd.DataFrame:
+        """
+        Stored metrics rows for the given run_ids (missing ones are left out).
+        """
+        run_ids = list(run_ids)
+        parts = [self.query(f"run_id IN ({','.join('?' * len(run_ids[i:i + 500]))})", run_ids[i:i + 500], limit=None)
+                 for i in range(0, len(run_ids), 500)]
+        return pd.concat(parts, ignore_index=True) if parts else self.query("0", limit=None)
+
+    def equity(self, run_id) -> np.ndarray:
+        """
+        The stored equity curve of one run, or None.
+        """
+        return self._array(run_id, "equity")
+
+    def trades(self, run_id) -> np.ndarray:
+        """
+        The stored trade records of one run, or None.
+        """
+        return self._array(run_id, "trades")
+
+    def _array(self, run_id, column):
+        with self._connect() as db:
+            row = db.execute(f"SELECT {column} FROM arrays WHERE run_id = ?", (run_id,)).fetchone()
+        return None if row is None or row[0] is None else _unpack(row[0])
+
+    def count(self) -> int:
+        with self._connect() as db:
+            return db.execute("SELECT COUNT(*) FROM runs").fetchone()[0]
+
+
+class _Connection:
+    """
+    sqlite3 connection that commits (or rolls back) and closes on exit.
+    """
+    def __init__(self, path):
+        self.db = sqlite3.connect(path, timeout=30)
+
+    def __enter__(self):
+        return self.db
+
+    def __exit__(self, exc_type, *exc):
+        with closing(self.db):
+            if exc_type is None:
+                self.db.commit()
+            else:
+                self.db.rollback()
+        return False
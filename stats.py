@@ -1,40 +1,222 @@
 import pandas as pd
 import numpy as np
+from backtester import TRADE_DTYPE
+from profiling import profiled
 
-class PerformanceStats:
-    def __init__(self, df: pd.DataFrame):
-        self.df = df
-        self.trades = df.dropna(subset=['Trade Exit Price'])
+TRADING_DAYS = 252
 
-    def compute(self):
-        trades = self.trades
-        equity = self.df['Equity'].dropna()
-        initial_capital = equity.iloc[0] if len(equity) > 0 else 0
-        final_equity = equity.iloc[-1] if len(equity) > 0 else 0  
-        total_pnl = final_equity - initial_capital
+def _trades_from_frame(df: pd.DataFrame) -> np.ndarray:
+    """
+    Rebuild minimal trade records (entry/exit index, profit, return) from the
+    result columns, for frames that come without engine trade records.
+    """
+    entries = np.flatnonzero(df['Trade Entry Price'].notna().to_numpy())
+    exits = np.flatnonzero(df['Trade Exit Price'].notna().to_numpy())
 
-        num_trades = len(trades)
-        wins = trades[trades['ProfitLoss'] > 0]
+    trades = np.zeros(len(entries), dtype=TRADE_DTYPE)
+    trades['entry_index'] = entries
+    trades['exit_index'] = -1
+    trades['stop_price'] = np.nan
+    trades['profit'] = np.nan
+    trades['trade_return'] = np.nan
 
-        win_rate = len(wins) / num_trades if num_trades > 0 else 0
-        avg_pl = trades['ProfitLoss'].mean() if num_trades > 0 else 0
+    closed = trades[:len(exits)]
+    closed['exit_index'] = exits
+    closed['profit'] = df['ProfitLoss'].to_numpy()[exits]
+    closed['trade_return'] = df['Trade Return'].to_numpy()[exits]
+    return trades
 
-        returns = equity.pct_change().dropna()
-        sharpe_ratio = (returns.mean() / returns.std()) * np.sqrt(252) if len(returns) > 1 else 0
-        max_dd = (equity / equity.cummax() - 1).min()
+def _group_sum(values, groups, k):
+    """
+    Sum values per strategy (a plain sum when there is only one).
+    """
+    if k == 1:
+        return np.array([values.sum()])
+    return np.bincount(groups, weights=values, minlength=k)
+
+def metrics_from_arrays(equity, trades=None, index=None, periods_per_year=TRADING_DAYS) -> dict:
+    """
+    Numeric performance metrics straight from NumPy arrays.
+
+    equity is one curve (bars,) or an equity matrix (bars x strategies).
+    trades is a record array with entry_index, exit_index, profit and
+    trade_return fields (plus strategy for a matrix), such as
+    Backtester.trades or BatchBacktester.exits; exit_index < 0 marks a
+    position still open. index (a DatetimeIndex) is used for CAGR, otherwise
+    bars are assumed to be periods_per_year per year.
+
+    Returns a dict of floats for one curve, or of (strategies,) arrays.
+    """
+    equity = np.asarray(equity, dtype=np.float64)
+    single = equity.ndim == 1
+    # strategies x bars, so each curve is reduced as one contiguous row
+    curves = np.ascontiguousarray(equity.reshape(len(equity), -1).T)
+    k, n = curves.shape
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        initial_capital = curves[:, 0] if n > 0 else np.zeros(k)
+        final_equity = curves[:, -1] if n > 0 else np.zeros(k)
+        total_pnl = final_equity - initial_capital
+
+        returns = curves[:, 1:] / curves[:, :-1] - 1
+        if n > 2:
+            sharpe_ratio = (returns.mean(axis=1) / returns.std(axis=1, ddof=1)) * np.sqrt(periods_per_year)
+        else:
+            sharpe_ratio = np.zeros(k)
+        if n > 0:
+            max_dd = (curves / np.maximum.accumulate(curves, axis=1) - 1).min(axis=1)
+            min_equity = curves.min(axis=1)
+        else:
+            max_dd = np.full(k, np.nan)
+            min_equity = np.zeros(k)
 
         # 🔥 Ruin calculation
-        min_equity = equity.min()
-        ruin_pct = ((initial_capital - min_equity) / initial_capital) * 100 if initial_capital > 0 else 0
+        ruin_pct = np.where(initial_capital > 0, ((initial_capital - min_equity) / initial_capital) * 100, 0.0)
+
+        if isinstance(index, pd.DatetimeIndex) and n > 1:
+            years = (index[-1] - index[0]) / pd.Timedelta(days=365.25)
+        else:
+            years = n / periods_per_year
+        cagr = np.where((initial_capital > 0) & (years > 0),
+                        (final_equity / initial_capital) ** (1 / years if years > 0 else 0) - 1, np.nan)
+
+        # Trade statistics, grouped by strategy column
+        if trades is None:
+            trades = np.zeros(0, dtype=TRADE_DTYPE)
+        groups = trades['strategy'] if 'strategy' in trades.dtype.names else np.zeros(len(trades), dtype=np.int64)
+        closed = trades['exit_index'] >= 0
+        profits = trades['profit'][closed]
+        trade_returns = trades['trade_return'][closed]
+        closed_groups = groups[closed]
+
+        num_trades = np.bincount(closed_groups, minlength=k)
+        wins = np.bincount(closed_groups, weights=profits > 0, minlength=k)
+        total_profit = _group_sum(profits, closed_groups, k)
+        gross_profit = _group_sum(np.where(profits > 0, profits, 0.0), closed_groups, k)
+        gross_loss = -_group_sum(np.where(profits < 0, profits, 0.0), closed_groups, k)
+
+        has_trades = num_trades > 0
+        win_rate = np.where(has_trades, wins / num_trades, 0.0)
+        avg_pl = np.where(has_trades, total_profit / num_trades, 0.0)
+        expectancy = np.where(has_trades, _group_sum(trade_returns, closed_groups, k) / num_trades, 0.0)
+        profit_factor = np.where(gross_loss > 0, gross_profit / gross_loss, np.where(gross_profit > 0, np.inf, 0.0))
+
+        # Bars with a position open, entry bar through exit bar
+        held = np.where(trades['exit_index'] >= 0, trades['exit_index'] - trades['entry_index'] + 1, n - trades['entry_index'])
+        time_in_market = np.bincount(groups, weights=held, minlength=k) / n if n > 0 else np.zeros(k)
+
+    metrics = {
+        "initial_capital": initial_capital,
+        "final_equity": final_equity,
+        "total_pnl": total_pnl,
+        "total_trades": num_trades,
+        "win_rate": win_rate,
+        "avg_pl": avg_pl,
+        "sharpe_ratio": sharpe_ratio,
+        "max_drawdown": max_dd,
+        "ruin_pct": ruin_pct,
+        "profit_factor": profit_factor,
+        "expectancy": expectancy,
+        "cagr": cagr,
+        "time_in_market": time_in_market,
+    }
+    if single:
+        return {name: int(value[0]) if name == "total_trades" else float(value[0]) for name, value in metrics.items()}
+    return metrics
+
+def rolling_max(values, window):
+    """
+    Rolling maximum over the last `window` rows in O(n) (van Herk /
+    Gil-Werman block prefix/suffix maxima). The first window-1 rows are NaN.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    n = len(values)
+    out = np.full(values.shape, np.nan)
+    if window < 1 or n < window:
+        return out
+
+    pad = (-n) % window
+    padded = np.concatenate([values, np.full((pad,) + values.shape[1:], -np.inf)])
+    blocks = padded.reshape((-1, window) + values.shape[1:])
+    prefix = np.maximum.accumulate(blocks, axis=1).reshape(padded.shape)
+    suffix = np.maximum.accumulate(blocks[:, ::-1], axis=1)[:, ::-1].reshape(padded.shape)
+
+    out[window - 1:] = np.maximum(suffix[:n - window + 1], prefix[window - 1:n])
+    return out
+
+def rolling_drawdown(equity, window):
+    """
+    Drawdown from the highest equity of the last `window` bars, in O(n).
+    Works on one curve or an equity matrix (bars x strategies).
+    """
+    equity = np.asarray(equity, dtype=np.float64)
+    return equity / rolling_max(equity, window) - 1
+
+def rolling_sharpe(equity, window, periods_per_year=TRADING_DAYS):
+    """
+    Sharpe ratio of the last `window` bar returns, in O(n) via running sums.
+    Works on one curve or an equity matrix (bars x strategies).
+    """
+    equity = np.asarray(equity, dtype=np.float64)
+    out = np.full(equity.shape, np.nan)
+    if window < 2 or len(equity) <= window:
+        return out
+
+    returns = equity[1:] / equity[:-1] - 1
+    zero = np.zeros((1,) + returns.shape[1:])
+    sums = np.concatenate([zero, np.cumsum(returns, axis=0)])
+    squares = np.concatenate([zero, np.cumsum(returns ** 2, axis=0)])
+
+    window_sum = sums[window:] - sums[:-window]
+    window_squares = squares[window:] - squares[:-window]
+    mean = window_sum / window
+    var = np.maximum(window_squares - window_sum * mean, 0) / (window - 1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        out[window:] = mean / np.sqrt(var) * np.sqrt(periods_per_year)
+    return out
+
+class PerformanceStats:
+    """
+    Performance metrics from backtest results. Pass the engine's trade
+    records (Backtester.trades) to skip scanning the frame for exits.
+    """
+    def __init__(self, df: pd.DataFrame, trades: np.ndarray = None):
+        self.df = df
+        self.trades = trades if trades is not None else _trades_from_frame(df)
+
+    def metrics(self):
+        """
+        Raw numeric performance metrics, suitable for ranking and sweeps.
+        """
+        equity = self.df['Equity'].dropna()
+        return metrics_from_arrays(equity.to_numpy(), self.trades, index=equity.index)
+
+    def rolling(self, window):
+        """
+        Rolling Sharpe ratio and drawdown series over `window` bars.
+        """
+        equity = self.df['Equity'].dropna()
+        return pd.DataFrame({
+            "Rolling Sharpe": rolling_sharpe(equity.to_numpy(), window),
+            "Rolling Drawdown": rolling_drawdown(equity.to_numpy(), window),
+        }, index=equity.index)
+
+    @profiled("stats", lambda args, result: {"bars": len(args[0].df), "trades": len(args[0].trades)})
+    def compute(self):
+        m = self.metrics()
 
         return {
-            "Initial Capital": f"${initial_capital:,.2f}",
-            "Final Equity": f"${final_equity:,.2f}",
-            "Total PnL": f"${total_pnl:,.2f}",
-            "Total Trades": num_trades,
-            "Win Rate": f"{win_rate * 100:.2f}%",
-            "Avg P/L per Trade": f"${avg_pl:,.2f}",
-            "Sharpe Ratio": f"{sharpe_ratio:.4f}",
-            "Max Drawdown": f"{max_dd * 100:.2f}%",
-            "Ruin (Max Loss from Peak)": f"{ruin_pct:.2f}%",
+            "Initial Capital": f"${m['initial_capital']:,.2f}",
+            "Final Equity": f"${m['final_equity']:,.2f}",
+            "Total PnL": f"${m['total_pnl']:,.2f}",
+            "Total Trades": m['total_trades'],
+            "Win Rate": f"{m['win_rate'] * 100:.2f}%",
+            "Avg P/L per Trade": f"${m['avg_pl']:,.2f}",
+            "Sharpe Ratio": f"{m['sharpe_ratio']:.4f}",
+            "Max Drawdown": f"{m['max_drawdown'] * 100:.2f}%",
+            "Ruin (Max Loss from Peak)": f"{m['ruin_pct']:.2f}%",
+            "Profit Factor": f"{m['profit_factor']:.2f}",
+            "Expectancy (per trade)": f"{m['expectancy'] * 100:.2f}%",
+            "CAGR": f"{m['cagr'] * 100:.2f}%",
+            "Time in Market": f"{m['time_in_market'] * 100:.2f}%",
         }
@@ -0,0 +1,158 @@
+import numpy as np
+from indicators import IndicatorCalculator, StreamingEMA
+from risk_manager import RiskManager
+from position_sizer import PositionSizer
+
+
+class StreamingBacktester:
+    """
+    Incremental EMA crossover backtest for live / paper-trading replay.
+
+    Holds O(1) state (running EMAs, position, stop price, equity and any order
+    pending for the next bar) and accepts one OHLC bar at a time. Fed the same
+    history it produces the same trades as IndicatorCalculator.apply_ema_crossover
+    followed by Backtester.run_backtest: signals on bar i fill on bar i+1's open
+    (plus skid), and stop losses are checked on exit-signal bars. The only
+    difference is at the end of a history: the batch engine never acts on
+    its final bar, while a stream has no final bar.
+    """
+    def __init__(self, indicator: IndicatorCalculator, initial_capital=100000, skid=1.0, risk_manager: RiskManager=None, position_sizer: PositionSizer=None):
+        self.short_period = indicator.short_period
+        self.long_period = indicator.long_period
+        self.initial_capital = initial_capital
+        self.skid = skid
+        self.risk_manager = risk_manager or RiskManager()
+        self.position_sizer = position_sizer or PositionSizer()
+        if self.risk_manager.get_stop_loss_type() == 'atr':
+            # No running ATR here; the stop would silently fall back to stop_loss_pct
+            raise ValueError("StreamingBacktester does not support 'atr' stops")
+
+        self.ema_short = StreamingEMA(self.short_period)
+        self.ema_long = StreamingEMA(self.long_period)
+        self.prev_short = np.nan
+        self.prev_long = np.nan
+        self.bar_index = -1
+
+        # Track portfolio state
+        self.equity = initial_capital
+        self.in_position = False
+        self.entry_index = None
+        self.entry_price = None
+        self.position_size = None
+        self.stop_price = None
+
+        # Order decided on the previous bar, filled on this one: (kind, capital)
+        self.pending = None
+
+    def _signal(self, close):
+        """
+        Update the EMAs and return this bar's crossover signal.
+        """
+        short = self.ema_short.update(close)
+        long = self.ema_long.update(close)
+        prev_short, prev_long = self.prev_short, self.prev_long
+        self.prev_short, self.prev_long = short, long
+
+        if self.bar_index < max(self.short_period, self.long_period - 1):
+            return 0
+        if short > long and prev_short <= prev_long:
+            return 1
+        if short < long and prev_short >= prev_long:
+            return -1
+        return 0
+
+    def _close_position(self, exit_price, reason, time):
+        """
+        Realize the open trade and return its fill event.
+        """
+        trade_return = (exit_price - self.entry_price) / self.entry_price
+        profit = trade_return * self.position_size * self.entry_price
+        self.equity += profit
+
+        fill = {
+            'time': time,
+            'index': self.bar_index,
+            'side': 'Sell',
+            'price': exit_price,
+            'size': self.position_size,
+            'reason': reason,
+            'entry_index': self.entry_index,
+            'entry_price': self.entry_price,
+            'trade_return': trade_return,
+            'profit': profit,
+            'equity': self.equity,
+        }
+
+        self.in_position = False
+        self.entry_index = None
+        self.entry_price = None
+        self.position_size = None
+        self.stop_price = None
+        return fill
+
+    def on_bar(self, time, open_, high, low, close):
+        """
+        Process one bar. Returns {'time', 'index', 'signal', 'equity', 'fills'}.
+        """
+        self.bar_index += 1
+        fills = []
+        exited_here = False
+
+        # Fill the order decided on the previous bar at this bar's open
+        if self.pending is not None:
+            kind, capital = self.pending
+            self.pending = None
+            if kind == 'entry':
+                self.entry_price = open_ + self.skid * abs(high - open_)
+                self.stop_price = self.risk_manager.get_stop_price(self.entry_price)
+                allocated = self.position_sizer.calculate(self.entry_price, capital, self.stop_price)
+                self.position_size = allocated / self.entry_price
+                self.entry_index = self.bar_index
+                fills.append({
+                    'time': time,
+                    'index': self.bar_index,
+                    'side': 'Buy',
+                    'price': self.entry_price,
+                    'size': self.position_size,
+                    'reason': None,
+                })
+            else:
+                exit_price = open_ - self.skid * abs(open_ - low)
+                fills.append(self._close_position(exit_price, 'Signal', time))
+                exited_here = True
+
+        signal = self._signal(close)
+
+        # Entry Logic: Look for buy signals when flat
+        if not self.in_position and signal == 1:
+            # Sizing uses the capital the batch engine reads for this bar: live
+            # equity only if a signal exit was filled here, else initial capital
+            capital = self.equity if exited_here else self.initial_capital
+            self.pending = ('entry', capital)
+            self.in_position = True
+
+        # Exit Logic: Handle stop losses and exit signals when in position
+        elif self.in_position and signal == -1:
+            if self.risk_manager.get_stop_loss_type() == 'trailing':
+                self.stop_price = self.risk_manager.update_trailing_stop(self.stop_price, high)
+
+            if self.risk_manager.check_stop(low, self.stop_price):
+                fills.append(self._close_position(self.stop_price, 'Stop Loss', time))
+            else:
+                self.pending = ('exit', None)
+
+        return {
+            'time': time,
+            'index': self.bar_index,
+            'signal': signal,
+            'equity': self.equity,
+            'fills': fills,
+        }
+
+    def run(self, bars):
+        """
+        Consume an iterable of (time, open, high, low, close) bars, yielding
+        each bar's update as it is processed.
+        """
+        for time, open_, high, low, close in bars:
+            yield self.on_bar(time, open_, high, low, close)
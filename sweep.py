@@ -0,0 +1,380 @@
+import itertools
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+
+from backtester import simulate
+from batch_backtester import BatchBacktester
+from indicator_cache import IndicatorCache, fingerprint
+from indicators import IndicatorCalculator, crossover_signal, breakout_signal
+from position_sizer import PositionSizer, VolatilityPositionSizer
+from risk_manager import RiskManager
+from run_store import METRICS, RunStore, run_params
+from stats import metrics_from_arrays
+
+# Defaults match the class defaults and the Streamlit sidebar
+DEFAULT_PARAMS = {
+    "short_period": 9,
+    "long_period": 21,
+    "stop_loss_pct": 0.25,
+    "stop_loss_type": "fixed",
+    "skid": 1.0,
+    "position_pct": 0.01,
+}
+
+# Keltner breakout defaults match the Streamlit "TradingView (Keltner)" sidebar
+KELTNER_PARAMS = {
+    "kc_period": 15,
+    "atr_period": 14,
+    "kc_multiplier": 1.0,
+    "stop_loss_pct": 0.25,
+    "stop_loss_type": "atr",
+    "atr_multiplier": 1.0,
+    "initial_risk": 0.01,
+    "risk_equity": 0.01,
+    "skid": 1.0,
+    "position_pct": 0.01,
+}
+
+STRATEGIES = {
+    "ema": DEFAULT_PARAMS,
+    "keltner": KELTNER_PARAMS,
+}
+
+# Indicator parameters of each strategy, as stored with a run (see stored_params)
+INDICATOR_PARAMS = {
+    "ema": ("short_period", "long_period", "trend_rule", "trend_period"),
+    "keltner": ("kc_period", "atr_period", "kc_multiplier"),
+}
+
+OHLC_COLUMNS = ['Open', 'High', 'Low', 'Close']
+
+# Per-process state set up once by _init_worker
+_worker = {}
+
+
+def parameter_grid(grid: dict, defaults: dict = DEFAULT_PARAMS) -> list:
+    """
+    Expand {name: [values]} into a list of parameter dicts (cartesian product).
+    Missing parameters fall back to `defaults` (DEFAULT_PARAMS or KELTNER_PARAMS).
+    """
+    for name in grid:
+        if name not in defaults:
+            raise ValueError(f"Unknown sweep parameter '{name}'")
+
+    names = list(grid)
+    combos = []
+    for values in itertools.product(*(grid[name] for name in names)):
+        params = dict(defaults)
+        params.update(zip(names, values))
+        combos.append(params)
+    return combos
+
+
+class SharedArray:
+    """
+    A NumPy array copied once into a shared-memory block so worker processes
+    can attach to the same buffer instead of receiving a pickled copy per task.
+    """
+    def __init__(self, array: np.ndarray):
+        array = np.ascontiguousarray(array)
+        self.shape = array.shape
+        self.dtype = array.dtype.str
+        self.shm = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+        np.ndarray(self.shape, dtype=array.dtype, buffer=self.shm.buf)[:] = array
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    @property
+    def spec(self):
+        """
+        (name, shape, dtype) to pass to attach() in a worker.
+        """
+        return self.name, self.shape, self.dtype
+
+    def close(self):
+        """
+        Release and remove the shared block.
+        """
+        self.shm.close()
+        self.shm.unlink()
+
+
+class SharedOHLC(SharedArray):
+    """
+    Open/High/Low/Close prices as one shared (bars x 4) float64 block.
+    """
+    def __init__(self, df: pd.DataFrame):
+        super().__init__(df[OHLC_COLUMNS].to_numpy(dtype=np.float64))
+
+
+def attach(name, shape, dtype):
+    """
+    Attach to a SharedArray from a worker. Keep the returned block
+    referenced for as long as the array is used.
+    """
+    shm = shared_memory.SharedMemory(name=name)
+    return shm, np.ndarray(shape, dtype=np.dtype(dtype), buffer=shm.buf)
+
+
+def _bar_times(df: pd.DataFrame):
+    """
+    int64 nanosecond bar times (UTC for tz-aware indexes), or None when the
+    frame has no DatetimeIndex.
+    """
+    if not isinstance(df.index, pd.DatetimeIndex):
+        return None
+    return df.index.as_unit('ns').asi8
+
+
+def _bar_index(times):
+    """
+    DatetimeIndex of _bar_times() output, as metrics_from_arrays() needs it for CAGR.
+    """
+    return None if times is None else pd.DatetimeIndex(np.asarray(times).view('datetime64[ns]'))
+
+
+def _set_local(prices, initial_capital, cache_dir=None, shm=None, times=None):
+    """
+    Set up the per-process state: prices, bar times, their fingerprints and
+    an indicator cache (sharing cache_dir's disk tier with other workers).
+    """
+    _worker.clear()
+    _worker.update(
+        shm=shm, prices=prices, index=_bar_index(times), initial_capital=initial_capital,
+        indicators=IndicatorCalculator(cache=IndicatorCache(cache_dir=cache_dir)),
+        close=pd.Series(prices[:, 3]),
+        bars=pd.DataFrame(prices[:, 1:], columns=OHLC_COLUMNS[1:]),
+        close_fingerprint=fingerprint(np.ascontiguousarray(prices[:, 3])),
+        hlc_fingerprint=fingerprint(*(np.ascontiguousarray(prices[:, j]) for j in (1, 2, 3))),
+    )
+
+
+def _init_worker(spec, initial_capital, cache_dir=None, time_spec=None):
+    """
+    Attach to the shared OHLC (and bar time) blocks once per worker process.
+    """
+    shm, prices = attach(*spec)
+    time_shm, times = attach(*time_spec) if time_spec is not None else (None, None)
+    _set_local(prices, initial_capital, cache_dir, (shm, time_shm), times)
+
+
+def _ema(period):
+    """
+    EMA of the shared closes, computed once per period per worker.
+    """
+    return _worker['indicators'].calculate_ema(_worker['close'], period, _worker['close_fingerprint']).to_numpy()
+
+
+def _atr(period):
+    """
+    ATR of the shared bars, computed once per period per worker.
+    """
+    return _worker['indicators'].calculate_atr(_worker['bars'], period, _worker['hlc_fingerprint']).to_numpy()
+
+
+def _signal(params):
+    """
+    Entry/exit signal of one parameter set: Keltner breakout when the set
+    has a kc_period, otherwise the EMA crossover.
+    """
+    if 'kc_period' in params:
+        middle = _ema(params['kc_period'])
+        width = params['kc_multiplier'] * _atr(params['atr_period'])
+        return breakout_signal(_worker['prices'][:, 3], middle + width, middle - width)
+    return crossover_signal(
+        _ema(params['short_period']), _ema(params['long_period']),
+        params['short_period'], params['long_period']
+    )
+
+
+def _risk_manager(params):
+    """
+    RiskManager for one parameter set.
+    """
+    return RiskManager(
+        stop_loss_pct=params['stop_loss_pct'], stop_loss_type=params['stop_loss_type'],
+        atr_multiplier=params.get('atr_multiplier', 1.0), initial_risk=params.get('initial_risk'),
+    )
+
+
+def _position_sizer(params):
+    """
+    Volatility sizing when the set has a risk_equity, else fixed percentage.
+    """
+    if 'risk_equity' in params:
+        return VolatilityPositionSizer(risk_equity=params['risk_equity'], position_pct=params['position_pct'])
+    return PositionSizer(position_pct=params['position_pct'])
+
+
+def stored_params(strategy, params, initial_capital) -> dict:
+    """
+    RunStore parameters of one parameter set, in the run_params() layout
+    used for single backtests too, so a sweep and the Streamlit app store
+    the same run under the same run_id.
+    """
+    return run_params(
+        _risk_manager(params), _position_sizer(params),
+        indicators={name: params[name] for name in INDICATOR_PARAMS[strategy] if name in params},
+        skid=params['skid'], initial_capital=initial_capital,
+    )
+
+
+def _run_one(params):
+    """
+    Backtest one parameter set against the worker's OHLC arrays.
+    """
+    prices = _worker['prices']
+    result = simulate(
+        prices[:, 0], prices[:, 1], prices[:, 2], _signal(params),
+        _worker['initial_capital'], params['skid'],
+        _risk_manager(params), _position_sizer(params),
+        _atr(params['atr_period']) if 'atr_period' in params else None
+    )
+
+    row = dict(params)
+    row.update(metrics_from_arrays(result['equity'], result['trades'], index=_worker['index']))
+    return row
+
+
+def _run_batch(combos):
+    """
+    Backtest a chunk of parameter sets in one BatchBacktester pass.
+    """
+    prices = _worker['prices']
+    signals = np.empty((len(prices), len(combos)), dtype=np.int64)
+    for j, params in enumerate(combos):
+        signals[:, j] = _signal(params)
+
+    atr = None
+    if 'atr_period' in combos[0]:
+        atr = np.empty((len(prices), len(combos)))
+        for j, params in enumerate(combos):
+            atr[:, j] = _atr(params['atr_period'])
+
+    bars = pd.DataFrame(prices[:, :3], columns=OHLC_COLUMNS[:3])
+    batch = BatchBacktester(
+        bars, signals, _worker['initial_capital'],
+        skid=[params['skid'] for params in combos],
+        risk_managers=[_risk_manager(params) for params in combos],
+        position_sizers=[_position_sizer(params) for params in combos],
+        atr=atr,
+    )
+    equity = batch.run_backtest()
+
+    metrics = metrics_from_arrays(equity, batch.exits, index=_worker['index'])
+
+    rows = []
+    for j, params in enumerate(combos):
+        row = dict(params)
+        row.update({name: values[j].item() for name, values in metrics.items()})
+        rows.append(row)
+    return rows
+
+
+class ParameterSweep:
+    """
+    Runs a grid of strategy / risk settings over one dataset in parallel.
+    strategy is "ema" (crossover) or "keltner" (channel breakout with ATR
+    stops and volatility sizing); see DEFAULT_PARAMS / KELTNER_PARAMS.
+
+    With batch=True each worker advances its whole share of the grid in one
+    BatchBacktester pass instead of one backtest per parameter set.
+    Every worker caches its indicator arrays; with cache_dir they are also
+    shared on disk between workers and later runs on the same data.
+    With a RunStore, parameter sets already stored for this dataset are
+    read back instead of re-run, and new results are added to it.
+    """
+    def __init__(self, df: pd.DataFrame, initial_capital=100000, max_workers=None, batch=False, strategy="ema", cache_dir=None,
+                 store: RunStore = None):
+        if strategy not in STRATEGIES:
+            raise ValueError(f"Unknown strategy '{strategy}', expected one of {tuple(STRATEGIES)}")
+        self.df = df
+        self.strategy = strategy
+        self.initial_capital = initial_capital
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.batch = batch
+        self.cache_dir = cache_dir
+        self.store = store
+
+    def _run_combos(self, combos) -> list:
+        """
+        Result rows (parameters plus metrics) of the given parameter sets.
+        """
+        if self.max_workers == 1 or len(combos) <= 1:
+            _set_local(self.df[OHLC_COLUMNS].to_numpy(dtype=np.float64), self.initial_capital, self.cache_dir,
+                       times=_bar_times(self.df))
+            return _run_batch(combos) if self.batch and combos else [_run_one(params) for params in combos]
+
+        times = _bar_times(self.df)
+        shared = SharedOHLC(self.df)
+        shared_times = SharedArray(times) if times is not None else None
+        try:
+            with ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                initializer=_init_worker,
+                initargs=(shared.spec, self.initial_capital, self.cache_dir,
+                          shared_times.spec if shared_times is not None else None),
+            ) as pool:
+                if self.batch:
+                    # Strided chunks balance the work; put the rows back in grid order
+                    workers = min(self.max_workers, len(combos))
+                    rows = [None] * len(combos)
+                    for w, chunk in enumerate(pool.map(_run_batch, [combos[w::workers] for w in range(workers)])):
+                        rows[w::workers] = chunk
+                    return rows
+                chunksize = max(1, len(combos) // (self.max_workers * 4))
+                return list(pool.map(_run_one, combos, chunksize=chunksize))
+        finally:
+            shared.close()
+            if shared_times is not None:
+                shared_times.close()
+
+    def _run_stored(self, combos) -> list:
+        """
+        _run_combos() through the RunStore: stored parameter sets are read
+        back, the rest are run and batch-inserted.
+        """
+        dataset = fingerprint(self.df[OHLC_COLUMNS].to_numpy(dtype=np.float64))
+
+        def run_key(params):
+            return RunStore.key(dataset, self.strategy, stored_params(self.strategy, params, self.initial_capital))
+
+        keys = [run_key(params) for params in combos]
+        stored = self.store.get(keys).set_index("run_id")
+
+        pending = [params for run_id, params in zip(keys, combos) if run_id not in stored.index]
+        # Each result row carries its own parameters, so key it by them
+        rows = {run_key(row): row for row in (self._run_combos(pending) if pending else [])}
+        self.store.insert({
+            "run_id": run_id, "dataset": dataset, "strategy": self.strategy,
+            "params": stored_params(self.strategy, row, self.initial_capital),
+            "metrics": {name: row[name] for name in METRICS},
+        } for run_id, row in rows.items())
+
+        for key, params in zip(keys, combos):
+            if key not in rows:
+                record = stored.loc[key]
+                rows[key] = dict(params, **{name: record[name] for name in METRICS})
+                rows[key]["total_trades"] = int(rows[key]["total_trades"])
+        return [rows[key] for key in keys]
+
+    def run(self, grid: dict, rank_by="sharpe_ratio", ascending=False) -> pd.DataFrame:
+        """
+        Run every combination in the grid and return one numeric results
+        table ranked by any metrics_from_arrays() / PerformanceStats.metrics() key.
+        """
+        combos = parameter_grid(grid, STRATEGIES[self.strategy])
+        rows = self._run_stored(combos) if self.store is not None else self._run_combos(combos)
+
+        results = pd.DataFrame(rows)
+        if len(results) and rank_by not in results.columns:
+            raise ValueError(f"Unknown metric '{rank_by}'")
+        if len(results):
+            results = results.sort_values(rank_by, ascending=ascending, kind="stable").reset_index(drop=True)
+        return results
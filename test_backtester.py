@@ -0,0 +1,69 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from backtester import Backtester
+from data_loader import DataLoaderTW
+from indicators import IndicatorCalculator
+from position_sizer import PositionSizer, VolatilityPositionSizer
+from risk_manager import RiskManager
+
+DATA = "tradingview_CMC_EURUSD.csv"
+
+
+@pytest.fixture(scope="module")
+def bars():
+    return DataLoaderTW(DATA).get_data()
+
+
+def ema_frame(bars, short_period=9, long_period=21):
+    return IndicatorCalculator(short_period=short_period, long_period=long_period).apply_ema_crossover(bars.copy())
+
+
+def keltner_frame(bars):
+    return IndicatorCalculator(kc_period=15, atr_period=14, kc_multiplier=1.0).apply_keltner_channel(bars.copy())
+
+
+def reasons(column):
+    return [reason if isinstance(reason, str) else None for reason in column]
+
+
+CASES = [
+    ("ema", 1.0, RiskManager(stop_loss_pct=0.25, stop_loss_type="fixed"), PositionSizer(position_pct=0.01)),
+    ("ema", 0.5, RiskManager(stop_loss_pct=0.01, stop_loss_type="fixed"), PositionSizer(position_pct=0.5)),
+    ("ema", 1.0, RiskManager(stop_loss_pct=0.01, stop_loss_type="trailing"), PositionSizer(position_pct=0.1)),
+    ("keltner", 1.0, RiskManager(stop_loss_pct=0.25, stop_loss_type="atr", initial_risk=0.01),
+     VolatilityPositionSizer(risk_equity=0.01, position_pct=0.01)),
+    ("keltner", 0.0, RiskManager(stop_loss_pct=0.02, stop_loss_type="trailing"),
+     VolatilityPositionSizer(risk_equity=0.02, position_pct=0.01)),
+]
+
+
+@pytest.mark.parametrize("strategy, skid, risk_manager, position_sizer", CASES)
+def test_fast_engine_matches_loop(bars, strategy, skid, risk_manager, position_sizer):
+    df = ema_frame(bars) if strategy == "ema" else keltner_frame(bars)
+    loop = Backtester(df.copy(), skid=skid, risk_manager=risk_manager, position_sizer=position_sizer, engine="loop")
+    fast = Backtester(df.copy(), skid=skid, risk_manager=risk_manager, position_sizer=position_sizer, engine="fast")
+    expected, result = loop.run_backtest(), fast.run_backtest()
+
+    assert result.index.equals(expected.index)
+    for column in ("Equity", "Trade Entry Price", "Trade Exit Price"):
+        np.testing.assert_array_equal(result[column].to_numpy(dtype=np.float64),
+                                      expected[column].to_numpy(dtype=np.float64), err_msg=column)
+    assert reasons(result["Exit Reason"]) == reasons(expected["Exit Reason"])
+    assert result["Exit Reason"].notna().sum() > 0
+
+
+def test_fast_engine_records_trades(bars):
+    df = ema_frame(bars)
+    bt = Backtester(df, risk_manager=RiskManager(), position_sizer=PositionSizer(), engine="fast")
+    result = bt.run_backtest()
+
+    closed = bt.trades[bt.trades["exit_index"] >= 0]
+    np.testing.assert_array_equal(closed["exit_price"], result["Trade Exit Price"].dropna().to_numpy(dtype=np.float64))
+    np.testing.assert_array_equal(closed["equity"], result["Equity"].iloc[closed["exit_index"]].to_numpy(dtype=np.float64))
+
+
+def test_unknown_engine(bars):
+    with pytest.raises(ValueError):
+        Backtester(bars, engine="vector")
@@ -0,0 +1,74 @@
+import numpy as np
+import pytest
+
+from backtester import TRADE_DTYPE, Backtester
+from batch_backtester import BatchBacktester
+from data_loader import DataLoaderTW
+from indicators import IndicatorCalculator
+from position_sizer import PositionSizer, VolatilityPositionSizer
+from risk_manager import RiskManager
+
+DATA = "tradingview_CMC_EURUSD.csv"
+
+PAIRS = [(5, 21), (9, 21), (12, 50), (20, 100)]
+RISK_MANAGERS = [
+    RiskManager(stop_loss_pct=0.25, stop_loss_type="fixed"),
+    RiskManager(stop_loss_pct=0.01, stop_loss_type="trailing"),
+    RiskManager(stop_loss_pct=0.02, stop_loss_type="fixed"),
+    RiskManager(stop_loss_pct=0.005, stop_loss_type="trailing"),
+]
+POSITION_SIZERS = [PositionSizer(position_pct=pct) for pct in (0.01, 0.1, 0.5, 1.0)]
+SKID = [1.0, 0.5, 0.0, 1.0]
+
+
+@pytest.fixture(scope="module")
+def bars():
+    return DataLoaderTW(DATA).get_data()
+
+
+def assert_same_trades(batch_trades, trades):
+    # Batch exits carry no min_low; every other record field must match
+    for field in set(TRADE_DTYPE.names) & set(batch_trades.dtype.names):
+        np.testing.assert_array_equal(batch_trades[field], trades[field], err_msg=field)
+
+
+def test_columns_match_single_backtests(bars):
+    ind = IndicatorCalculator()
+    signals = ind.crossover_signal_matrix(bars["Close"], PAIRS)
+    batch = BatchBacktester(bars, signals, skid=SKID, risk_managers=RISK_MANAGERS, position_sizers=POSITION_SIZERS)
+    equity = batch.run_backtest()
+    assert equity.shape == (len(bars), len(PAIRS))
+
+    for j, (short, long) in enumerate(PAIRS):
+        df = IndicatorCalculator(short_period=short, long_period=long).apply_ema_crossover(bars.copy())
+        np.testing.assert_array_equal(signals[(short, long)].to_numpy(), df["Signal"].to_numpy())
+        bt = Backtester(df, skid=SKID[j], risk_manager=RISK_MANAGERS[j], position_sizer=POSITION_SIZERS[j], engine="fast")
+        expected = bt.run_backtest()
+
+        np.testing.assert_array_equal(equity[:, j], expected["Equity"].to_numpy(dtype=np.float64))
+        assert_same_trades(batch.trades((short, long)), bt.trades)
+
+        frame = batch.to_frame((short, long))
+        for column in ("Equity", "Trade Entry Price", "Trade Exit Price", "Position Size"):
+            np.testing.assert_array_equal(frame[column].to_numpy(dtype=np.float64),
+                                          expected[column].to_numpy(dtype=np.float64), err_msg=column)
+        assert frame["Exit Reason"].fillna("").tolist() == expected["Exit Reason"].fillna("").tolist()
+
+
+def test_atr_stops_and_volatility_sizing(bars):
+    df = IndicatorCalculator(kc_period=15, atr_period=14, kc_multiplier=1.0).apply_keltner_channel(bars.copy())
+    risk_manager = RiskManager(stop_loss_pct=0.25, stop_loss_type="atr", atr_multiplier=1.5, initial_risk=0.02)
+    sizer = VolatilityPositionSizer(risk_equity=0.01, position_pct=0.01)
+    bt = Backtester(df, risk_manager=risk_manager, position_sizer=sizer, engine="fast")
+    expected = bt.run_backtest()
+
+    batch = BatchBacktester(df, df["Signal"].to_numpy(), risk_managers=risk_manager, position_sizers=sizer,
+                            atr=df["ATR"].to_numpy())
+    equity = batch.run_backtest()
+    np.testing.assert_array_equal(equity[:, 0], expected["Equity"].to_numpy(dtype=np.float64))
+    assert_same_trades(batch.trades(0), bt.trades)
+
+
+def test_signal_rows_must_match_bars(bars):
+    with pytest.raises(ValueError):
+        BatchBacktester(bars, np.zeros((len(bars) - 1, 2)))
@@ -0,0 +1,43 @@
+import numpy as np
+import pytest
+
+from backtester import Backtester
+from data_loader import DataLoaderTW
+from indicators import IndicatorCalculator
+from monte_carlo import MonteCarlo
+from position_sizer import PositionSizer, VolatilityPositionSizer
+from risk_manager import RiskManager
+
+DATA = "tradingview_CMC_EURUSD.csv"
+
+
+@pytest.fixture(scope="module")
+def frame():
+    return IndicatorCalculator(short_period=9, long_period=21).apply_ema_crossover(DataLoaderTW(DATA).get_data())
+
+
+def closed_trades(frame, sizer):
+    bt = Backtester(frame, risk_manager=RiskManager(stop_loss_pct=0.02), position_sizer=sizer, engine="fast")
+    bt.run_backtest()
+    return bt.trades
+
+
+@pytest.mark.parametrize("sizer, allocation", [
+    (PositionSizer(position_pct=0.5), lambda trades: 0.5 / trades["entry_price"]),
+    # 1% of equity at risk down to a 2% stop: half the equity allocated
+    (VolatilityPositionSizer(risk_equity=0.01), lambda trades: np.full(len(trades), 0.5)),
+])
+def test_trades_are_sized_with_the_sizer(frame, sizer, allocation):
+    trades = closed_trades(frame, sizer)
+    closed = trades[trades["exit_index"] >= 0]
+    mc = MonteCarlo.from_trades(trades, position_sizer=sizer)
+    np.testing.assert_allclose(mc.equity_returns, closed["trade_return"] * allocation(closed))
+
+
+def test_shuffled_paths_compound_the_same_trades(frame):
+    sizer = PositionSizer(position_pct=0.5)
+    mc = MonteCarlo.from_trades(closed_trades(frame, sizer), position_sizer=sizer, method="shuffle", seed=7)
+    result = mc.run(paths=500, chunk_size=200)
+    # Reordering never changes a compounded product
+    np.testing.assert_allclose(result["final_equity"], mc.initial_capital * np.prod(1 + mc.equity_returns))
+    assert (result["max_drawdown"] <= 0).all()
@@ -0,0 +1,53 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from resample import Resampler
+
+AGG = {"Open": "first", "High": "max", "Low": "min", "Close": "last", "Volume": "sum"}
+
+
+@pytest.fixture(scope="module")
+def hourly():
+    """
+    Hourly bars with the forex weekend gap (Friday 22:00 to Sunday 22:00),
+    starting mid-week and mid-day.
+    """
+    index = pd.date_range("2024-01-03 05:00", "2024-03-29 21:00", freq="h", name="Date").as_unit("ns")
+    index = index[~(((index.dayofweek == 4) & (index.hour >= 22)) | (index.dayofweek == 5)
+                    | ((index.dayofweek == 6) & (index.hour < 22)))]
+    rng = np.random.default_rng(0)
+    close = 1.1 + np.cumsum(rng.normal(0, 1e-3, len(index)))
+    open_ = np.append(1.1, close[:-1])
+    spread = rng.uniform(0, 1e-3, (2, len(index)))
+    return pd.DataFrame({
+        "Open": open_,
+        "High": np.maximum(open_, close) + spread[0],
+        "Low": np.minimum(open_, close) - spread[1],
+        "Close": close,
+        "Volume": rng.integers(1, 100, len(index)).astype(np.float64),
+    }, index=index)
+
+
+@pytest.mark.parametrize("rule", ["4h", "1D", "1W", "7D"])
+def test_matches_pandas_resample(hourly, rule):
+    expected = hourly.resample(rule).agg(AGG).dropna(subset=["Open"])
+    pd.testing.assert_frame_equal(Resampler(hourly).resample(rule), expected, check_freq=False)
+
+
+def test_align_only_sees_closed_bars(hourly):
+    resampler = Resampler(hourly)
+    weekly = resampler.resample("1W")
+    aligned = resampler.align("1W", weekly["Close"])
+    # Only the first (partial) week's last bar sees that week closed
+    first_week = np.flatnonzero(hourly.index < weekly.index[0] + pd.Timedelta(days=1))
+    assert np.isnan(aligned[first_week[:-1]]).all()
+    assert aligned[first_week[-1]] == weekly["Close"].iloc[0]
+    assert not np.isnan(aligned[first_week[-1] + 1:]).any()
+
+
+def test_rejects_multi_week_and_calendar_rules(hourly):
+    with pytest.raises(ValueError):
+        Resampler(hourly).resample("2W")
+    with pytest.raises(ValueError):
+        Resampler(hourly).resample("ME")
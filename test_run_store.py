@@ -0,0 +1,49 @@
+import numpy as np
+import pytest
+
+from run_store import RunStore
+
+# (sharpe_ratio, max_drawdown) of each stored run; None is a metric that could not be computed
+METRICS = [(1.5, -0.05), (2.5, -0.20), (0.5, -0.08), (None, -0.02), (2.0, -0.09), (-0.3, -0.01)]
+
+
+def run(i, sharpe, drawdown):
+    params = {"short_period": i, "long_period": 21}
+    return {"run_id": RunStore.key("fingerprint", "ema_crossover", params), "dataset": "fingerprint",
+            "strategy": "ema_crossover", "params": params,
+            "metrics": {"sharpe_ratio": sharpe, "max_drawdown": drawdown, "total_trades": i},
+            "equity": np.linspace(100000, 100000 + 1000 * i, 50)}
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = RunStore(str(tmp_path / "runs.sqlite"))
+    assert store.insert(run(i, *metrics) for i, metrics in enumerate(METRICS)) == len(METRICS)
+    return store
+
+
+def test_insert_skips_stored_runs(store):
+    runs = [run(i, *metrics) for i, metrics in enumerate(METRICS)]
+    new = run(len(METRICS), 3.0, -0.03)
+    assert store.existing([r["run_id"] for r in runs] + [new["run_id"]]) == {r["run_id"] for r in runs}
+
+    # The stored copy is kept, not overwritten
+    runs[0]["metrics"]["sharpe_ratio"] = 9.9
+    assert store.insert(runs + [new]) == 1
+    assert store.count() == len(METRICS) + 1
+    assert store.get([runs[0]["run_id"]])["sharpe_ratio"].tolist() == [1.5]
+    np.testing.assert_array_equal(store.equity(new["run_id"]), new["equity"])
+
+
+def test_top_runs_within_drawdown(store):
+    top = store.query("max_drawdown > ?", (-0.10,), order_by="sharpe_ratio", limit=3)
+    assert top["sharpe_ratio"].tolist() == [2.0, 1.5, 0.5]
+    assert [params["short_period"] for params in top["params"]] == [4, 0, 2]
+
+
+@pytest.mark.parametrize("ascending", [False, True])
+def test_unranked_runs_sort_last(store, ascending):
+    ranked = store.query("max_drawdown > ?", (-0.10,), order_by="sharpe_ratio", ascending=ascending, limit=None)
+    sharpe = sorted((s for s, dd in METRICS if s is not None and dd > -0.10), reverse=not ascending)
+    assert ranked["sharpe_ratio"].tolist()[:-1] == sharpe
+    assert np.isnan(ranked["sharpe_ratio"].iloc[-1])
@@ -0,0 +1,61 @@
+import numpy as np
+import pytest
+
+from backtester import EXIT_REASONS, Backtester
+from data_loader import DataLoaderTW
+from indicators import IndicatorCalculator
+from position_sizer import PositionSizer, VolatilityPositionSizer
+from risk_manager import RiskManager
+from streaming import StreamingBacktester
+
+DATA = "tradingview_CMC_EURUSD.csv"
+
+
+@pytest.fixture(scope="module")
+def bars():
+    return DataLoaderTW(DATA).get_data()
+
+
+def stream(bars, backtester):
+    rows = zip(bars.index, bars["Open"], bars["High"], bars["Low"], bars["Close"])
+    return [fill for update in backtester.run(rows) for fill in update["fills"]]
+
+
+@pytest.mark.parametrize("skid, risk_manager, position_sizer", [
+    (1.0, RiskManager(stop_loss_pct=0.25, stop_loss_type="fixed"), PositionSizer(position_pct=0.01)),
+    (0.5, RiskManager(stop_loss_pct=0.01, stop_loss_type="trailing"), PositionSizer(position_pct=0.5)),
+    (1.0, RiskManager(stop_loss_pct=0.02, stop_loss_type="fixed"), VolatilityPositionSizer(risk_equity=0.01)),
+])
+def test_stream_matches_batch_trades(bars, skid, risk_manager, position_sizer):
+    indicator = IndicatorCalculator(short_period=9, long_period=21)
+    bt = Backtester(indicator.apply_ema_crossover(bars.copy()), skid=skid, risk_manager=risk_manager,
+                    position_sizer=position_sizer, engine="fast")
+    bt.run_backtest()
+    trades = bt.trades[bt.trades["exit_index"] >= 0]
+
+    fills = stream(bars, StreamingBacktester(indicator, skid=skid, risk_manager=risk_manager, position_sizer=position_sizer))
+    # The batch engine never acts on the final bar; a stream does
+    exits = [fill for fill in fills if fill["side"] == "Sell" and fill["index"] < len(bars) - 1]
+    assert len(exits) == len(trades) > 0
+
+    np.testing.assert_array_equal([fill["entry_index"] for fill in exits], trades["entry_index"])
+    np.testing.assert_array_equal([fill["index"] for fill in exits], trades["exit_index"])
+    np.testing.assert_array_equal([fill["entry_price"] for fill in exits], trades["entry_price"])
+    np.testing.assert_array_equal([fill["price"] for fill in exits], trades["exit_price"])
+    np.testing.assert_array_equal([fill["size"] for fill in exits], trades["size"])
+    np.testing.assert_array_equal([fill["equity"] for fill in exits], trades["equity"])
+    assert [fill["reason"] for fill in exits] == list(EXIT_REASONS[trades["reason"]])
+
+
+def test_stream_resumes_where_it_left_off(bars):
+    indicator = IndicatorCalculator(short_period=9, long_period=21)
+    whole = stream(bars, StreamingBacktester(indicator))
+
+    split = StreamingBacktester(indicator)
+    half = len(bars) // 2
+    assert stream(bars.iloc[:half], split) + stream(bars.iloc[half:], split) == whole
+
+
+def test_atr_stops_rejected():
+    with pytest.raises(ValueError):
+        StreamingBacktester(IndicatorCalculator(), risk_manager=RiskManager(stop_loss_type="atr"))
@@ -0,0 +1,54 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from backtester import Backtester
+from data_loader import DataLoaderTW
+from indicators import IndicatorCalculator
+from plot import _trade_markers
+from position_sizer import PositionSizer
+from risk_manager import RiskManager
+from stats import PerformanceStats
+from trade_log import TradeLog
+
+DATA = "tradingview_CMC_EURUSD.csv"
+CAPITAL, POSITION_PCT = 100000, 0.1
+
+
+@pytest.fixture(scope="module", params=["fixed", "trailing"])
+def backtest(request):
+    """
+    (loop engine results, fast engine results, fast engine trade records).
+    The loop results carry no records, so they give the frame-scan baseline.
+    """
+    df = IndicatorCalculator(short_period=9, long_period=21).apply_ema_crossover(DataLoaderTW(DATA).get_data())
+    settings = dict(initial_capital=CAPITAL, risk_manager=RiskManager(stop_loss_pct=0.01, stop_loss_type=request.param),
+                    position_sizer=PositionSizer(position_pct=POSITION_PCT))
+    loop = Backtester(df.copy(), engine="loop", **settings)
+    fast = Backtester(df.copy(), engine="fast", **settings)
+    baseline, results = loop.run_backtest(), fast.run_backtest()
+    assert loop.trades is None
+    assert fast.trades is not None
+    return baseline, results, fast.trades
+
+
+def test_trade_log_from_records_matches_scan(backtest):
+    baseline, results, trades = backtest
+    expected = TradeLog(baseline, CAPITAL, POSITION_PCT).generate()
+    log = TradeLog(results, CAPITAL, POSITION_PCT, trades=trades).generate()
+    assert len(log) > 0
+    pd.testing.assert_frame_equal(log, expected)
+
+
+def test_stats_from_records_match_scan(backtest):
+    baseline, results, trades = backtest
+    assert PerformanceStats(results, trades=trades).compute() == PerformanceStats(baseline).compute()
+
+
+def test_markers_from_records_match_scan(backtest):
+    baseline, results, trades = backtest
+    markers, expected = _trade_markers(results, trades), _trade_markers(baseline, None)
+    assert len(markers[2][0]) > 0
+    for (times, prices), (expected_times, expected_prices) in zip(markers, expected):
+        assert pd.DatetimeIndex(times).equals(pd.DatetimeIndex(expected_times))
+        np.testing.assert_array_equal(np.asarray(prices, dtype=np.float64), np.asarray(expected_prices, dtype=np.float64))
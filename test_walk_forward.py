@@ -0,0 +1,50 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from indicators import IndicatorCalculator
+from walk_forward import WalkForward
+
+GRID = {"short_period": [5], "long_period": [21], "stop_loss_pct": [0.5]}
+IN_SAMPLE, OUT_OF_SAMPLE = 200, 100
+
+
+@pytest.fixture(scope="module")
+def bars():
+    """
+    A slow upward-drifting wave: crossovers every ~40 bars, so positions
+    regularly span out-of-sample window boundaries.
+    """
+    index = pd.date_range("2020-01-01", periods=1200, freq="D", name="Date").as_unit("ns")
+    close = 1.1 + 0.05 * np.sin(np.arange(len(index)) * 2 * np.pi / 80) + 1e-4 * np.arange(len(index))
+    open_ = np.append(close[0], close[:-1])
+    return pd.DataFrame({"Open": open_, "High": np.maximum(open_, close) + 1e-4,
+                         "Low": np.minimum(open_, close) - 1e-4, "Close": close}, index=index)
+
+
+def test_positions_open_at_window_end_are_closed(bars):
+    equity, windows = WalkForward(bars, GRID, IN_SAMPLE, OUT_OF_SAMPLE, max_workers=1).run()
+    signal = IndicatorCalculator(short_period=5, long_period=21).apply_ema_crossover(bars.copy())["Signal"].to_numpy()
+
+    spanning = 0
+    capital = 100000
+    for _, row in windows.iterrows():
+        start, end = bars.index.get_loc(row["Out-of-Sample Start"]), bars.index.get_loc(row["Out-of-Sample End"]) + 1
+        window = signal[start:end]
+        # Entries fill on the bar after a buy signal, so the last bar's signal never trades
+        entries = np.count_nonzero(window[:-1] == 1)
+        buys, sells = np.flatnonzero(window[:-1] == 1), np.flatnonzero(window == -1)
+        spanning += len(buys) > 0 and (len(sells) == 0 or sells[-1] < buys[-1])
+
+        # Every entry is closed within its window, and its P&L reaches the chained equity
+        assert row["oos_total_trades"] == entries
+        assert equity.iloc[end - 1 - IN_SAMPLE] == pytest.approx(capital + row["oos_total_pnl"])
+        capital = equity.iloc[end - 1 - IN_SAMPLE]
+    assert spanning > 0
+
+
+def test_parallel_windows_match(bars):
+    serial = WalkForward(bars, GRID, IN_SAMPLE, OUT_OF_SAMPLE, max_workers=1).run()
+    parallel = WalkForward(bars, GRID, IN_SAMPLE, OUT_OF_SAMPLE, max_workers=2).run()
+    pd.testing.assert_series_equal(serial[0], parallel[0])
+    pd.testing.assert_frame_equal(serial[1], parallel[1])
@@ -1,13 +1,70 @@
+import numpy as np
 import pandas as pd
+from profiling import profiled
+
+LOG_COLUMNS = [
+    'Entry Time',
+    'Exit Time',
+    'Trade Entry Price',
+    'Trade Exit Price',
+    'Trade Return',
+    'ProfitLoss',
+    'R Multiple',
+    'Position Size',
+    'Equity',
+    'Max Drawdown (%)',
+    'Duration (days)'
+]
 
 class TradeLog:
-    def __init__(self, df: pd.DataFrame, capital: float, position_pct: float):
+    """
+    Builds the per-trade log from backtest results.
+    Pass the engine's trade records (Backtester.trades) to build it in one
+    pass instead of scanning the frame for each exit. With lean=True those
+    columns keep their native types instead of object.
+    """
+    def __init__(self, df: pd.DataFrame, capital: float, position_pct: float, trades: np.ndarray = None, lean=False):
         self.df = df
         self.capital = capital
         self.position_pct = position_pct
+        self.trades = trades
+        self.lean = lean
+
+    def _object_column(self, values, index):
+        """
+        Object column, matching the dtype the row-by-row log produces.
+        """
+        if self.lean:
+            return pd.Series(values, index=index)
+        return pd.Series(list(values), index=index, dtype=object)
+
+    def _generate_from_records(self) -> pd.DataFrame:
+        df = self.df
+        records = self.trades[self.trades['exit_index'] >= 0]
+        entry_index = records['entry_index']
+        exit_index = records['exit_index']
 
+        trades = df.iloc[exit_index].copy()
+        trades['Exit Time'] = trades.index
+        trades['Entry Time'] = self._object_column(df.index[entry_index], trades.index)
+        trades['Trade Entry Price'] = self._object_column(records['entry_price'], trades.index)
+        trades['Trade Exit Price'] = self._object_column(records['exit_price'], trades.index)
+        trades['Position Size'] = self._object_column(records['size'], trades.index)
+        trades['Max Drawdown (%)'] = ((records['min_low'] - records['entry_price']) / records['entry_price']) * 100
+
+        # Duration and R multiple
+        trades['Duration (days)'] = self._object_column(exit_index - entry_index, trades.index)
+        risk_per_trade = self.capital * self.position_pct
+        trades['R Multiple'] = trades['ProfitLoss'] / risk_per_trade
+
+        return trades[LOG_COLUMNS]
+
+    @profiled("trade_log", lambda args, result: {"trades": len(result)})
     def generate(self) -> pd.DataFrame:
-        df = self.df.copy()
+        if self.trades is not None:
+            return self._generate_from_records()
+
+        df = self.df
         trades = df.dropna(subset=['Trade Exit Price']).copy()
 
         trades['Exit Time'] = trades.index
@@ -45,16 +102,4 @@ class TradeLog:
         risk_per_trade = self.capital * self.position_pct
         trades['R Multiple'] = trades['ProfitLoss'] / risk_per_trade
 
-        return trades[[
-            'Entry Time',
-            'Exit Time',
-            'Trade Entry Price',
-            'Trade Exit Price',
-            'Trade Return',
-            'ProfitLoss',
-            'R Multiple',
-            'Position Size',
-            'Equity',
-            'Max Drawdown (%)',
-            'Duration (days)'
-        ]]
+        return trades[LOG_COLUMNS]
@@ -1,17 +1,162 @@
+import json
+import os
+from concurrent.futures import Future
+from contextlib import nullcontext
 import streamlit as st
+from background import BackgroundRunner
+from backtester import Backtester
 from data_loader import DataLoaderYF, DataLoaderTW
+from data_cache import DataCache
 from indicators import IndicatorCalculator
-from position_sizer import PositionSizer
+from indicator_cache import IndicatorCache, fingerprint
+from position_sizer import PositionSizer, VolatilityPositionSizer
 from risk_manager import RiskManager
-from backtester import Backtester
 from stats import PerformanceStats
 from plot import plot_trades
+from profiling import Profiler
+from run_store import RunStore
+from sweep import OHLC_COLUMNS, stored_params
 from trade_log import TradeLog
 import pandas as pd
 
+# Larger histories are charted at this many candles for the selected range
+CHART_MAX_BARS = 2000
+
 st.set_page_config(layout="wide")
 st.title("📈 Forex Strategy Backtester")
 
+
+@st.cache_resource
+def indicator_cache():
+    """
+    One indicator cache shared by every rerun and session.
+    """
+    return IndicatorCache()
+
+
+@st.cache_resource
+def run_store():
+    """
+    Local store keeping finished backtests across reruns and sessions.
+    """
+    return RunStore()
+
+
+@st.cache_resource
+def background_runner():
+    """
+    Worker pool running backtests and sweeps off the script thread.
+    """
+    return BackgroundRunner()
+
+
+def read_data(source, symbol, start=None, end=None, interval=None, mtime=None):
+    """
+    Load OHLC data from Yahoo Finance or a TradingView CSV.
+    """
+    if source == "yfinance":
+        loader = DataLoaderYF(symbol, start, end, interval, cache=DataCache())
+    else:
+        loader = DataLoaderTW(symbol, time_col="time", cache=DataCache())
+    return loader.get_data()
+
+
+def add_indicators(df, strategy, params, cache=None):
+    """
+    Add the strategy's indicator and Signal columns.
+    """
+    if strategy == "keltner":
+        kc_period, atr_period, kc_multiplier = params
+        ind = IndicatorCalculator(kc_period=kc_period, atr_period=atr_period, kc_multiplier=kc_multiplier, cache=cache)
+        return ind.apply_keltner_channel(df)
+    short_period, long_period, trend_rule, trend_period = params
+    ind = IndicatorCalculator(short_period=short_period, long_period=long_period, cache=cache)
+    df = ind.apply_ema_crossover(df)
+    if trend_rule is not None:
+        df = ind.apply_trend_filter(df, trend_rule, trend_period)
+    return df
+
+
+@st.cache_data(show_spinner=False, ttl=3600)
+def load_data(source, symbol, start=None, end=None, interval=None, mtime=None):
+    """
+    Load OHLC data once per source/range; mtime makes a changed CSV a new entry.
+    """
+    return read_data(source, symbol, start, end, interval, mtime)
+
+
+@st.cache_data(show_spinner=False, ttl=3600)
+def indicator_frame(data_args, strategy, params):
+    """
+    Data with the strategy's indicator and Signal columns, cached per
+    dataset and indicator parameters.
+    """
+    return add_indicators(load_data(*data_args), strategy, params, cache=indicator_cache())
+
+
+def profile_backtest(data_args, strategy, params, capital, skid, risk_manager, sizer):
+    """
+    Run the whole pipeline inline and uncached under a Profiler, so every
+    stage is measured. Returns a finished Future of (results, trades) and
+    the Profiler.
+    """
+    profiler = Profiler(memory=True, cprofile=True)
+    with profiler:
+        df = add_indicators(read_data(*data_args), strategy, params)
+        bt = Backtester(df, initial_capital=capital, skid=skid, risk_manager=risk_manager,
+                        position_sizer=sizer, engine="fast")
+        results = bt.run_backtest()
+    future = Future()
+    future.set_result((results, bt.trades))
+    return future, profiler
+
+
+def save_run(run, results, trades):
+    """
+    Store a finished backtest's metrics, equity curve and trades (once per
+    dataset, strategy and parameters).
+    """
+    dataset = fingerprint(results[OHLC_COLUMNS].to_numpy(dtype="float64"))
+    run_store().insert([{
+        "run_id": RunStore.key(dataset, run["strategy"], run["params"]),
+        "dataset": dataset,
+        "strategy": run["strategy"],
+        "params": run["params"],
+        "metrics": PerformanceStats(results, trades=trades).metrics(),
+        "equity": results["Equity"].to_numpy(),
+        "trades": trades,
+    }])
+
+
+def parse_values(text, cast):
+    """
+    Parse a comma-separated list of sweep values.
+    """
+    return [cast(value) for value in text.replace(" ", "").split(",") if value]
+
+
+@st.fragment(run_every=0.5)
+def backtest_progress():
+    """
+    Poll the running backtest; the page reruns once it has finished.
+    """
+    if st.session_state["backtest"]["future"].done():
+        st.rerun()
+    st.info("Running backtest...", icon="⏳")
+
+
+@st.fragment(run_every=1.0)
+def sweep_progress():
+    """
+    Show sweep progress and the best results so far while it runs.
+    """
+    job = st.session_state["sweep"]
+    if job.done():
+        st.rerun()
+    st.progress(job.completed / job.total, text=f"{job.completed} / {job.total} parameter sets")
+    st.dataframe(job.results().head(20))
+
+
 run_backtest = st.sidebar.button("Run Backtest", type='secondary', icon='🚀', use_container_width=True)
 
 # --- Sidebar: Mode Selection ---
@@ -44,52 +189,141 @@ elif mode == "TradingView (Keltner)":
     initial_risk = st.sidebar.slider("% Initial Risk", 0.0, 10.0, 1.0, 0.1) / 100
     risk_equity = st.sidebar.slider("% Risk Equity", 0.0, 10.0, 1.0, 0.1) / 100
 
+# --- Higher-Timeframe Trend Filter (EMA modes) ---
+trend_rule, trend_period = None, None
+if mode in ("YFinance (EMA)", "TradingView (EMA)"):
+    # Only timeframes longer than the base bars (the TradingView export is daily)
+    trend_rules = ["4h", "1D", "1W"] if mode == "YFinance (EMA)" and interval == "1h" else ["1W"]
+    trend_rule = st.sidebar.selectbox("Trend Filter Timeframe", [None] + trend_rules, format_func=lambda rule: rule or "None")
+    trend_period = st.sidebar.number_input("Trend EMA", min_value=1, max_value=400, value=50, disabled=trend_rule is None)
+
 # --- Common Settings ---
 if mode != "Choose a strategy":
-    stop_loss_type = st.sidebar.selectbox("Stop Loss Type", ["fixed", "trailing"], index=0)
+    stop_loss_types = ["atr", "fixed", "trailing"] if mode == "TradingView (Keltner)" else ["fixed", "trailing"]
+    stop_loss_type = st.sidebar.selectbox("Stop Loss Type", stop_loss_types, index=0)
     skid = st.sidebar.slider("SKID (slippage factor)", 0.0, 1.0, 1.0, 0.1)
     position_pct = st.sidebar.slider("Position Size %", 0.001, 1.0, 0.01, 0.001)
     stop_loss_pct = st.sidebar.slider("Stop Loss %", 0.0, 1.0, 0.25, 0.01)
+    profile_run = st.sidebar.checkbox("Profile Run", help="Run inline and uncached, and report time and memory per stage")
 
-# --- Run Backtest ---
-if run_backtest and mode != "Choose a strategy":
-    with st.spinner("Running backtest..."):
-
-        # --- Load Data ---
-        if mode == "YFinance (EMA)":
-            loader = DataLoaderYF(symbol, str(start_date), str(end_date), interval)
+    # --- Parameter Sweep ---
+    with st.sidebar.expander("Parameter Sweep"):
+        if mode == "TradingView (Keltner)":
+            sweep_grid = {
+                "kc_period": parse_values(st.text_input("Length EMA values", "10, 15, 20"), int),
+                "atr_period": parse_values(st.text_input("Length ATR values", "10, 14, 20"), int),
+                "kc_multiplier": parse_values(st.text_input("Volatility Factor values", "0.5, 1.0, 1.5, 2.0"), float),
+            }
         else:
-            loader = DataLoaderTW("../data/tradingview_CMC_EURUSD.csv", time_col="time")
+            sweep_grid = {
+                "short_period": parse_values(st.text_input("Short EMA values", "5, 9, 12, 15"), int),
+                "long_period": parse_values(st.text_input("Long EMA values", "21, 30, 50, 100"), int),
+            }
+        rank_by = st.selectbox("Rank By", ["sharpe_ratio", "total_pnl", "profit_factor", "cagr", "max_drawdown"])
+        run_sweep = st.button("Run Sweep", icon='🧮', use_container_width=True)
 
-        df = loader.get_data()
-        print(f"Data loaded: {len(df)} rows")
-
-        # --- Apply Indicators ---
-        if mode in ["YFinance (EMA)", "TradingView (EMA)"]:
-            ind = IndicatorCalculator(short_period=short_ema, long_period=long_ema)
-            df = ind.apply_ema_crossover(df)
-        elif mode == "TradingView (Keltner)":
-            # ind = IndicatorCalculator(kc_period=kc_period, kc_multiplier=kc_mult)
-            # df = ind.apply_keltner_channel(df)
-            pass
+if mode != "Choose a strategy":
+    # --- Load Data and Indicators (cached across reruns) ---
+    if mode == "YFinance (EMA)":
+        data_args = ("yfinance", symbol, str(start_date), str(end_date), interval)
+    else:
+        path = "../data/tradingview_CMC_EURUSD.csv"
+        data_args = ("tradingview", path, None, None, None, os.path.getmtime(path) if os.path.exists(path) else None)
 
+    if mode == "TradingView (Keltner)":
+        strategy, indicator_params = "keltner", (length_ema, length_atr, volatility_factor)
+        sizer = VolatilityPositionSizer(risk_equity=risk_equity, position_pct=position_pct)
+        risk_manager = RiskManager(stop_loss_pct=stop_loss_pct, stop_loss_type=stop_loss_type,
+                                   atr_multiplier=volatility_factor, initial_risk=initial_risk)
+        fixed_params = {"atr_multiplier": [volatility_factor], "initial_risk": [initial_risk], "risk_equity": [risk_equity]}
+        params = {"kc_period": length_ema, "atr_period": length_atr, "kc_multiplier": volatility_factor,
+                  "atr_multiplier": volatility_factor, "initial_risk": initial_risk, "risk_equity": risk_equity}
+    else:
+        strategy, indicator_params = "ema", (short_ema, long_ema, trend_rule, trend_period)
         sizer = PositionSizer(position_pct=position_pct)
         risk_manager = RiskManager(stop_loss_pct=stop_loss_pct, stop_loss_type=stop_loss_type)
+        fixed_params = {}
+        params = {"short_period": short_ema, "long_period": long_ema}
+        if trend_rule is not None:
+            params.update(trend_rule=trend_rule, trend_period=trend_period)
 
-        # --- Run Backtest ---
-        bt = Backtester(df, initial_capital=capital, skid=skid, risk_manager=risk_manager, position_sizer=sizer)
-        results = bt.run_backtest()
+    # --- Submit Backtest ---
+    # Same run_id layout as the sweep, so either finds the other's stored runs
+    params.update(stop_loss_pct=stop_loss_pct, stop_loss_type=stop_loss_type, skid=skid, position_pct=position_pct)
+    run = {"strategy": strategy, "params": stored_params(strategy, params, capital)}
+    if run_backtest and profile_run:
+        with st.spinner("Profiling backtest..."):
+            future, profiler = profile_backtest(data_args, strategy, indicator_params, capital, skid, risk_manager, sizer)
+        st.session_state["backtest"] = {
+            "future": future,
+            "capital": capital,
+            "position_pct": position_pct,
+            "run": run,
+            "profiler": profiler,
+            "rendered": False,
+        }
+    elif run_backtest:
+        with st.spinner("Loading data..."):
+            df = indicator_frame(data_args, strategy, indicator_params)
+        print(f"Data loaded: {len(df)} rows")
+
+        st.session_state["backtest"] = {
+            "future": background_runner().submit_backtest(df, initial_capital=capital, skid=skid,
+                                                          risk_manager=risk_manager, position_sizer=sizer),
+            "capital": capital,
+            "position_pct": position_pct,
+            "run": run,
+            "cache_stats": indicator_cache().stats(),
+        }
 
-        # --- Show Results ---
-        st.subheader("📊 Performance Summary")
-        stats = PerformanceStats(results).compute()
-        st.table(stats)
+    # --- Submit Sweep ---
+    if run_sweep:
+        with st.spinner("Loading data..."):
+            df = load_data(*data_args)
+        previous = st.session_state.get("sweep")
+        if previous is not None:
+            previous.cancel()
+        grid = dict(sweep_grid, stop_loss_type=[stop_loss_type], skid=[skid],
+                    position_pct=[position_pct], stop_loss_pct=[stop_loss_pct], **fixed_params)
+        st.session_state["sweep"] = background_runner().submit_sweep(
+            df, grid, strategy=strategy, initial_capital=capital, rank_by=rank_by
+        )
 
-        st.subheader("📈 Trade Chart")
-        plot_trades(results)
+# --- Show Backtest Results ---
+backtest = st.session_state.get("backtest")
+if backtest is not None and mode != "Choose a strategy":
+    future = backtest["future"]
+    if not future.done():
+        backtest_progress()
+    elif future.exception() is not None:
+        st.error(f"Backtest failed: {future.exception()}")
+    else:
+        results, trades = future.result()
+        capital, position_pct = backtest["capital"], backtest["position_pct"]
+        if not backtest.get("stored"):
+            save_run(backtest["run"], results, trades)
+            backtest["stored"] = True
+        profiler = backtest.get("profiler")
+        # A profiled run also measures its first render (stats, chart, trade log)
+        profiling = profiler is not None and not backtest["rendered"]
 
-        st.subheader("📒 Trade Log")
-        trade_log_df = TradeLog(results, capital, position_pct).generate()
+        with profiler if profiling else nullcontext():
+            st.subheader("📊 Performance Summary")
+            stats = PerformanceStats(results, trades=trades).compute()
+            st.table(stats)
+
+            st.subheader("📈 Trade Chart")
+            if len(results) > CHART_MAX_BARS:
+                first, last = results.index[0].to_pydatetime(), results.index[-1].to_pydatetime()
+                window = st.slider("Visible Range", min_value=first, max_value=last, value=(first, last), format="YYYY-MM-DD HH:mm")
+                plot_trades(results, trades=trades, max_bars=CHART_MAX_BARS, window=window)
+            else:
+                plot_trades(results, trades=trades)
+
+            st.subheader("📒 Trade Log")
+            trade_log_df = TradeLog(results, capital, position_pct, trades=trades).generate()
+        if profiling:
+            backtest["rendered"] = True
         st.dataframe(trade_log_df.style.format({
             'Trade Entry Price': '{:.5f}',
             'Trade Exit Price': '{:.5f}',
@@ -98,7 +332,39 @@ if run_backtest and mode != "Choose a strategy":
             'R Multiple': '{:.2f}',
             'Equity': '${:,.2f}'
         }, na_rep='-'))
-elif mode == "Choose a strategy":
+
+        cache_stats = backtest.get("cache_stats")
+        if cache_stats is not None:
+            st.caption(f"Indicator cache: {cache_stats['hits']} hits, {cache_stats['disk_hits']} disk hits, "
+                       f"{cache_stats['misses']} misses")
+
+        if profiler is not None:
+            st.subheader("⏱️ Profile")
+            st.caption(f"Wall time {profiler.wall_time:.3f}s")
+            st.dataframe(profiler.report().style.format(precision=4, na_rep='-'))
+            with st.expander("cProfile"):
+                st.code(profiler.cprofile_stats(), language=None)
+
+# --- Show Sweep Results ---
+sweep_job = st.session_state.get("sweep")
+if sweep_job is not None and mode != "Choose a strategy":
+    st.subheader("🧮 Parameter Sweep")
+    if not sweep_job.done():
+        sweep_progress()
+    else:
+        for error in sweep_job.errors():
+            st.error(f"Sweep chunk failed: {error}")
+        st.dataframe(sweep_job.results())
+
+# --- Stored Runs ---
+if mode != "Choose a strategy":
+    with st.expander("🗄️ Stored Runs"):
+        stored_rank = st.selectbox("Rank Stored Runs By", ["sharpe_ratio", "total_pnl", "profit_factor", "cagr", "created"])
+        drawdown_limit = st.slider("Max Drawdown Limit %", 0, 100, 100, 1)
+        stored = run_store().query("max_drawdown >= ?", (-drawdown_limit / 100,), order_by=stored_rank, limit=20)
+        st.dataframe(stored.assign(params=stored["params"].map(json.dumps)))
+
+if mode == "Choose a strategy":
     st.sidebar.warning("Please select a strategy and click 'Run Backtest' to see results.")
     if run_backtest:
         st.toast("Please select a strategy first before running the backtest.", icon="🚨")
\ No newline at end of file
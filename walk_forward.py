@@ -0,0 +1,204 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from backtester import EXIT_SIGNAL, simulate
+from batch_backtester import BatchBacktester
+from indicators import IndicatorCalculator
+from position_sizer import PositionSizer
+from risk_manager import RiskManager
+from stats import metrics_from_arrays
+from sweep import OHLC_COLUMNS, SharedArray, SharedOHLC, attach, parameter_grid, _bar_index, _bar_times
+
+# Per-process state set up once by _init_worker
+_worker = {}
+
+
+def _risk_settings(combos):
+    """
+    Per-combo skid, RiskManager and PositionSizer lists for BatchBacktester.
+    """
+    return dict(
+        skid=[params['skid'] for params in combos],
+        risk_managers=[RiskManager(stop_loss_pct=params['stop_loss_pct'], stop_loss_type=params['stop_loss_type']) for params in combos],
+        position_sizers=[PositionSizer(position_pct=params['position_pct']) for params in combos],
+    )
+
+
+def _init_worker(price_spec, signal_spec, time_spec, combos, pair_columns, initial_capital, rank_by, ascending):
+    """
+    Attach to the shared price, signal and bar time blocks once per worker process.
+    """
+    price_shm, prices = attach(*price_spec)
+    signal_shm, signals = attach(*signal_spec)
+    time_shm, times = attach(*time_spec) if time_spec is not None else (None, None)
+    _worker.clear()
+    _worker.update(
+        shms=(price_shm, signal_shm, time_shm), prices=prices, signals=signals, index=_bar_index(times), combos=combos,
+        pair_columns=pair_columns, initial_capital=initial_capital, rank_by=rank_by, ascending=ascending,
+    )
+
+
+def _optimize_window(bounds):
+    """
+    Score every parameter set on one in-sample window in a single batch pass
+    and return (best combo number, its metric value).
+    """
+    start, end = bounds
+    prices = _worker['prices'][start:end]
+    combos = _worker['combos']
+    bars = pd.DataFrame(prices[:, :3], columns=OHLC_COLUMNS[:3])
+    signals = _worker['signals'][start:end][:, _worker['pair_columns']]
+
+    batch = BatchBacktester(bars, signals, _worker['initial_capital'], **_risk_settings(combos))
+    equity = batch.run_backtest()
+    index = _worker['index'][start:end] if _worker['index'] is not None else None
+    scores = metrics_from_arrays(equity, batch.exits, index=index)[_worker['rank_by']].astype(np.float64)
+
+    # NaN scores never win
+    scores = np.where(np.isnan(scores), np.inf if _worker['ascending'] else -np.inf, scores)
+    best = int(np.argmin(scores) if _worker['ascending'] else np.argmax(scores))
+    return best, float(scores[best])
+
+
+def _close_at_end(result, low, close):
+    """
+    Close a position still open on a window's last bar at that bar's close
+    (recorded as a signal exit), so its P&L reaches the window's equity
+    and metrics instead of vanishing when the next window starts flat.
+    """
+    trades = result['trades']
+    if not len(trades) or trades['exit_index'][-1] >= 0:
+        return result
+    last = len(close) - 1
+    entry_index, entry_price, size = trades['entry_index'][-1], trades['entry_price'][-1], trades['size'][-1]
+    trade_return = (close[last] - entry_price) / entry_price
+    profit = trade_return * size * entry_price
+    equity = result['equity'][last] + profit
+
+    result['exit_price'][last] = close[last]
+    result['exit_reason'][last] = EXIT_SIGNAL
+    result['trade_return'][last] = trade_return
+    result['profit_loss'][last] = profit
+    result['equity'][last] = equity
+    for field, value in (('exit_index', last), ('exit_price', close[last]), ('reason', EXIT_SIGNAL),
+                         ('min_low', np.min(low[entry_index:last + 1])), ('trade_return', trade_return),
+                         ('profit', profit), ('equity', equity)):
+        trades[field][-1] = value
+    return result
+
+
+class WalkForward:
+    """
+    Walk-forward optimization of the EMA crossover strategy.
+
+    Indicators are computed once over the full history: every EMA period in
+    the grid and the crossover signal of every (short, long) pair. Each
+    in-sample window is then scored from slices of those arrays with one
+    BatchBacktester pass, windows run in parallel, and the best parameters
+    trade the following out-of-sample window. Out-of-sample windows are
+    chained so each starts with the previous window's final equity; a
+    position still open at a window's end is closed at its last close.
+    """
+    def __init__(self, df: pd.DataFrame, grid: dict, in_sample=1000, out_of_sample=250, step=None,
+                 rank_by="sharpe_ratio", ascending=False, initial_capital=100000, max_workers=None):
+        if step is not None and step < out_of_sample:
+            raise ValueError("step must be at least out_of_sample so out-of-sample windows do not overlap")
+        if rank_by not in metrics_from_arrays(np.zeros(1)):
+            raise ValueError(f"Unknown metric '{rank_by}'")
+        self.df = df
+        self.grid = grid
+        self.in_sample = in_sample
+        self.out_of_sample = out_of_sample
+        self.step = step or out_of_sample
+        self.rank_by = rank_by
+        self.ascending = ascending
+        self.initial_capital = initial_capital
+        self.max_workers = max_workers or os.cpu_count() or 1
+
+    def _windows(self):
+        """
+        (in-sample start, in-sample end, out-of-sample end) bar positions.
+        """
+        windows = []
+        start = 0
+        while start + self.in_sample < len(self.df):
+            is_end = start + self.in_sample
+            windows.append((start, is_end, min(is_end + self.out_of_sample, len(self.df))))
+            start += self.step
+        return windows
+
+    def run(self):
+        """
+        Returns (stitched out-of-sample equity Series, per-window DataFrame
+        with the chosen parameters and their in/out-of-sample results).
+        """
+        combos = parameter_grid(self.grid)
+        windows = self._windows()
+        if not combos or not windows:
+            return pd.Series(dtype=np.float64, name='Equity'), pd.DataFrame()
+
+        # Indicators once over the full history
+        pairs = sorted({(params['short_period'], params['long_period']) for params in combos})
+        signals = IndicatorCalculator().crossover_signal_matrix(self.df['Close'], pairs).to_numpy()
+        pair_columns = np.array([pairs.index((params['short_period'], params['long_period'])) for params in combos])
+        prices = self.df[OHLC_COLUMNS].to_numpy(dtype=np.float64)
+
+        bounds = [(start, is_end) for start, is_end, _ in windows]
+        init_args = (combos, pair_columns, self.initial_capital, self.rank_by, self.ascending)
+        if self.max_workers == 1 or len(windows) == 1:
+            _worker.clear()
+            _worker.update(prices=prices, signals=signals, index=_bar_index(_bar_times(self.df)),
+                           combos=combos, pair_columns=pair_columns, initial_capital=self.initial_capital, rank_by=self.rank_by, ascending=self.ascending)
+            chosen = [_optimize_window(b) for b in bounds]
+        else:
+            shared_prices = SharedOHLC(self.df)
+            shared_signals = SharedArray(signals)
+            times = _bar_times(self.df)
+            shared_times = SharedArray(times) if times is not None else None
+            try:
+                with ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    initializer=_init_worker,
+                    initargs=(shared_prices.spec, shared_signals.spec,
+                              shared_times.spec if shared_times is not None else None) + init_args,
+                ) as pool:
+                    chosen = list(pool.map(_optimize_window, bounds))
+            finally:
+                shared_prices.close()
+                shared_signals.close()
+                if shared_times is not None:
+                    shared_times.close()
+
+        # Trade each out-of-sample window with its chosen parameters, chaining equity
+        capital = self.initial_capital
+        curves = []
+        rows = []
+        for (start, is_end, oos_end), (best, score) in zip(windows, chosen):
+            params = combos[best]
+            result = simulate(
+                prices[is_end:oos_end, 0], prices[is_end:oos_end, 1], prices[is_end:oos_end, 2],
+                signals[is_end:oos_end, pair_columns[best]], capital, params['skid'],
+                RiskManager(stop_loss_pct=params['stop_loss_pct'], stop_loss_type=params['stop_loss_type']),
+                PositionSizer(position_pct=params['position_pct'])
+            )
+            result = _close_at_end(result, prices[is_end:oos_end, 2], prices[is_end:oos_end, 3])
+            oos = metrics_from_arrays(result['equity'], result['trades'], index=self.df.index[is_end:oos_end])
+            curves.append(pd.Series(result['equity'], index=self.df.index[is_end:oos_end]))
+
+            row = {
+                'In-Sample Start': self.df.index[start],
+                'In-Sample End': self.df.index[is_end - 1],
+                'Out-of-Sample Start': self.df.index[is_end],
+                'Out-of-Sample End': self.df.index[oos_end - 1],
+            }
+            row.update(params)
+            row[f'in_sample_{self.rank_by}'] = score
+            row.update({f'oos_{name}': value for name, value in oos.items()})
+            rows.append(row)
+            capital = result['equity'][-1]
+
+        equity = pd.concat(curves).rename('Equity')
+        return equity, pd.DataFrame(rows)